@@ -0,0 +1,54 @@
+import os
+import logging
+from datetime import datetime
+from src.loader import cargar_dataset, convertir_clase_ternaria_a_target, crear_clase_ternaria
+from src.features import feature_engineering_lag
+from src.indice_meses import construir_indice_meses
+from src.barrido import ejecutar_barrido
+from src.recursos import aplicar_presupuesto_cpu
+from src.conf import *
+
+# Compara las ventanas de barrido.experimentos de conf.yaml cargando los datos una sola vez
+# Uso: python barrido.py
+
+os.makedirs("logs", exist_ok=True)
+fecha = datetime.now().strftime("%Y-%m-%d_%H:%M:%S")
+ruta_log = f"logs/barrido_{fecha}.txt"
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(levelname)s - %(threadName)s - %(lineno)s - %(message)s",
+    handlers=[
+        logging.FileHandler(ruta_log, encoding="utf-8"),
+        logging.StreamHandler()
+    ]
+)
+
+logger = logging.getLogger(__name__)
+
+def main():
+    logger.info("Inicio del barrido de ventanas")
+    aplicar_presupuesto_cpu()
+
+    # Mismo pipeline de datos que main.py, una sola vez para todos los experimentos
+    df = cargar_dataset(DATA_PATH)
+    df = crear_clase_ternaria(df)
+    columnas = ["ctrx_quarter", "mrentabilidad", "mcuentas_saldo", "mtarjeta_visa_consumo", "cproductos"]
+    df_fe = feature_engineering_lag(df, columnas=columnas, cant_lag=2)
+    del df
+    df_fe = convertir_clase_ternaria_a_target(df_fe)
+    indice = construir_indice_meses(df_fe)
+    # El índice tiene todo lo que usan los experimentos: se libera el DataFrame
+    del df_fe
+
+    resultados = ejecutar_barrido(indice)
+
+    logger.info("===RESULTADOS DEL BARRIDO===")
+    for resultado in sorted(filter(None, resultados), key=lambda r: r["ganancia_test"], reverse=True):
+        logger.info(
+            f"{resultado['study_name']}: ganancia en test {resultado['ganancia_test']:,.0f} "
+            f"({resultado['envios_test']} envíos) - ventana {resultado['ventana']} - {resultado['segundos']:,.0f} s"
+        )
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+import os
+import logging
+import optuna
+from datetime import datetime
+from src.loader import cargar_dataset, convertir_clase_ternaria_a_target, crear_clase_ternaria
+from src.features import feature_engineering_lag
+from src.indice_meses import construir_indice_meses
+from src.optimization import optimizar
+from src.perfiles import sugerir_parametros
+from src.recursos import aplicar_presupuesto_cpu
+from src.conf import *
+
+# Compara el tiempo por trial de cada perfil de entrenamiento de conf.yaml
+# Uso: python benchmark_perfiles.py
+
+N_TRIALS_BENCHMARK = 10
+
+os.makedirs("logs", exist_ok=True)
+fecha = datetime.now().strftime("%Y-%m-%d_%H:%M:%S")
+ruta_log = f"logs/benchmark_perfiles_{fecha}.txt"
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(levelname)s - %(lineno)s - %(message)s",
+    handlers=[
+        logging.FileHandler(ruta_log, encoding="utf-8"),
+        logging.StreamHandler()
+    ]
+)
+
+logger = logging.getLogger(__name__)
+
+def main():
+    logger.info("Inicio del benchmark de perfiles de entrenamiento")
+    hilos = aplicar_presupuesto_cpu()
+
+    # Mismo pipeline de datos que main.py
+    df = cargar_dataset(DATA_PATH)
+    df = crear_clase_ternaria(df)
+    columnas = ["ctrx_quarter", "mrentabilidad", "mcuentas_saldo", "mtarjeta_visa_consumo", "cproductos"]
+    df_fe = feature_engineering_lag(df, columnas=columnas, cant_lag=2)
+    del df
+    df_fe = convertir_clase_ternaria_a_target(df_fe)
+    indice = construir_indice_meses(df_fe)
+    del df_fe
+
+    # Los mismos hiperparámetros en todos los perfiles: sólo cambia lo que fija cada perfil
+    params_benchmark = parametros_comunes(N_TRIALS_BENCHMARK)
+
+    resultados = {}
+    for perfil in PERFILES_LGB:
+        study = optimizar(
+            indice,
+            n_trials=N_TRIALS_BENCHMARK,
+            study_name=f"{STUDY_NAME}-benchmark-{perfil}",
+            perfil=perfil,
+            modo_costo="ganancia",
+            trials_encolados=params_benchmark
+        )
+        resultados[perfil] = resumir_trials(study)
+
+    logger.info("===RESULTADOS DEL BENCHMARK===")
+    logger.info(f"Trials por perfil: {N_TRIALS_BENCHMARK}, hilos: {hilos}")
+    for perfil, resultado in resultados.items():
+        if resultado is None:
+            logger.warning(f"Perfil {perfil}: ningún trial terminó dentro del presupuesto de tiempo")
+            continue
+        logger.info(
+            f"Perfil {perfil}: {resultado['segundos_por_trial']:.2f} s/trial, {resultado['rounds_por_trial']:.0f} rounds/trial "
+            f"({resultado['completos']} completos, {resultado['podados']} podados), "
+            f"mejor ganancia {resultado['mejor_ganancia']:,.0f}"
+        )
+
+def parametros_comunes(n_trials: int) -> list[dict]:
+    """
+    Muestrea n_trials juegos de hiperparámetros (con semilla fija) sobre la unión de los
+    espacios de búsqueda de todos los perfiles. Cada perfil ignora los que fija o no admite.
+    """
+    muestreo = optuna.create_study(sampler=optuna.samplers.RandomSampler(seed=SEMILLA[0]))
+    params_benchmark = []
+    for _ in range(n_trials):
+        trial = muestreo.ask()
+        for perfil in PERFILES_LGB:
+            sugerir_parametros(trial, perfil)
+        params_benchmark.append(dict(trial.params))
+    return params_benchmark
+
+def resumir_trials(study: optuna.Study) -> dict | None:
+    """
+    Tiempo y rounds promedio de los trials completos (los podados por deadline no entran
+    en el promedio). None si ningún trial terminó.
+    """
+    completos = study.get_trials(deepcopy=False, states=[optuna.trial.TrialState.COMPLETE])
+    podados = study.get_trials(deepcopy=False, states=[optuna.trial.TrialState.PRUNED])
+    if not completos:
+        return None
+
+    return {
+        "segundos_por_trial": sum(trial.duration.total_seconds() for trial in completos) / len(completos),
+        "rounds_por_trial": sum(trial.user_attrs.get("rounds", 0) for trial in completos) / len(completos),
+        "completos": len(completos),
+        "podados": len(podados),
+        "mejor_ganancia": max(trial.value for trial in completos)
+    }
+
+if __name__ == "__main__":
+    main()
@@ -6,9 +6,11 @@ import logging
 # para eso necesito el archivo __init__.py en src
 from src.loader import cargar_dataset, convertir_clase_ternaria_a_target, crear_clase_ternaria
 from src.features import feature_engineering_lag
+from src.indice_meses import construir_indice_meses
+from src.recursos import aplicar_presupuesto_cpu
 from src.optimization import optimizar, evaluar_en_test
 from src.best_params import cargar_los_mejores_hiperparametros
-from src.final_training import preparar_datos_entrenamiento_final, entrenar_modelo_final, generar_predicciones_finales, guardar_predicciones_finales, guardar_modelo_final
+from src.final_training import preparar_datos_entrenamiento_final, preparar_datos_prediccion, entrenar_modelo_final, generar_predicciones_finales, guardar_predicciones_finales, guardar_modelo_final, cargar_modelo_final, refrescar_modelo_final
 from src.conf import *
 
 # Crear carpeta logs
@@ -46,6 +48,7 @@ logger.info(f"COSTO_ESTIMULO: {COSTO_ESTIMULO}")
 def main():
     # Cargar datos 
     logger.info("Inicio de ejecución")
+    aplicar_presupuesto_cpu()
     os.makedirs("data", exist_ok=True)
     df = cargar_dataset(DATA_PATH)
 
@@ -56,6 +59,7 @@ def main():
     columnas = ["ctrx_quarter", "mrentabilidad", "mcuentas_saldo", "mtarjeta_visa_consumo", "cproductos"]
     cant_lag = 2
     df_fe = feature_engineering_lag(df, columnas=columnas, cant_lag=cant_lag)
+    del df
     logger.info(f"Feature engineering completado con {cant_lag} lags para {len(columnas) if columnas else 0} atributos")
 
     # Convertir clase ternaria a target binaria
@@ -68,36 +72,61 @@ def main():
     logger.info(f"Datos guardados en {path}")
     """
 
+    # Índice por mes compartido por optimización, test y entrenamiento final
+    indice = construir_indice_meses(df_fe)
+    # El índice tiene todo lo que usa el resto del pipeline: se libera el DataFrame
+    del df_fe
+
     # Ejecutar la optimización de hiperparámetros
-    study = optimizar(df_fe, n_trials=100)
+    # n_trials y presupuesto de tiempo desde conf.yaml
+    study = optimizar(indice)
 
     # Análisis adicional
     logger.info("===ANÁLISIS DE RESULTADOS===")
     trials_df = study.trials_dataframe()
     if len(trials_df) > 0:
-        top_5 = trials_df.nlargest(5, "value")
+        # Los trials podados por deadline no tienen valor
+        trials_df = trials_df[trials_df["state"] == "COMPLETE"]
+    # En modo multiobjetivo la ganancia es values_0
+    columna_valor = "value" if "value" in trials_df.columns else "values_0"
+    if len(trials_df) > 0:
+        top_5 = trials_df.astype({columna_valor: float}).nlargest(5, columna_valor)
         logger.info("Top 5 mejores trials:")
         for idx, trial in top_5.iterrows():
-            logger.info(f"Trial {trial['number']}: {trial['value']:,.0f}")
+            logger.info(f"Trial {trial['number']}: {trial[columna_valor]:,.0f}")
 
     logger.info("===OPTIMIZACIÓN COMPLETADA===")
-    logger.info(f"Mejores hiperparámetros: {study.best_params}")
-    logger.info(f"Ganancia en validación: {study.best_value:,.0f}")
+    if len(trials_df) > 0 and len(study.directions) > 1:
+        logger.info("Estudio multiobjetivo: ver el frente de Pareto ganancia/tiempo reportado por optimizar")
+    elif len(trials_df) > 0:
+        logger.info(f"Mejores hiperparámetros: {study.best_params}")
+        logger.info(f"Ganancia en validación: {study.best_value:,.0f}")
+    else:
+        # Sin trials completos, el JSON de iteraciones sólo tiene resultados de corridas anteriores
+        logger.error("Ningún trial terminó dentro del presupuesto de tiempo en esta corrida. Se detiene la ejecución")
+        logger.error("Aumentar presupuesto_tiempo en conf.yaml o usar el perfil fast")
+        return
     logger.info("===EVALUACIÓN EN EL CONJUNTO DE TEST===")
     mejores_params = cargar_los_mejores_hiperparametros()
     logger.info(f"Mejores hiperparámetros cargados: {mejores_params}")
-    ganancia_test = evaluar_en_test(df_fe, mejores_params)
-    logger.info(f"Ganancia en test: {ganancia_test:,.0f}")
-
-    # Entrenar modelo final
-    X_train, y_train, X_predict, clientes_predict = preparar_datos_entrenamiento_final(df_fe)
-    modelo = entrenar_modelo_final(X_train, y_train, mejores_params)
-
-    # Guardar el modelo entrenado (podría ser útil para futuras predicciones) como .txt
-    guardar_modelo_final(modelo)
-
-    # Generar predicciones finales
-    predicciones = generar_predicciones_finales(modelo, X_predict, clientes_predict)
+    ganancia_test, envios_test = evaluar_en_test(indice, mejores_params)
+    logger.info(f"Ganancia en test: {ganancia_test:,.0f} con {envios_test} envíos")
+
+    # Entrenar modelo final (o refrescar el del mes anterior si está habilitado en conf.yaml)
+    if REFRESCO_MODELO.get("INCREMENTAL", False):
+        X_predict, clientes_predict = preparar_datos_prediccion(indice)
+        modelo_previo, meses_modelo_previo = cargar_modelo_final()
+        modelo, meses_modelo = refrescar_modelo_final(indice, mejores_params, modelo_previo, meses_modelo_previo)
+    else:
+        X_train, y_train, X_predict, clientes_predict = preparar_datos_entrenamiento_final(indice)
+        modelo = entrenar_modelo_final(X_train, y_train, mejores_params, feature_name=indice["columnas"])
+        meses_modelo = FINAL_TRAIN
+
+    # Guardar el modelo entrenado como .txt, con sus meses de entrenamiento para futuros refrescos
+    guardar_modelo_final(modelo, meses_entrenamiento=meses_modelo)
+
+    # Generar predicciones finales (top-N con el corte óptimo de test)
+    predicciones = generar_predicciones_finales(modelo, X_predict, clientes_predict, envios=envios_test)
 
     # Guardar predicciones finales
     salida = guardar_predicciones_finales(predicciones)
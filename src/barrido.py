@@ -0,0 +1,111 @@
+import json
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from .conf import BARRIDO, PERFIL, RECURSOS
+from .optimization import optimizar, evaluar_en_test
+from .best_params import cargar_los_mejores_hiperparametros
+from .indice_meses import como_lista
+from .recursos import etapa_paralela, ejecutar_con_hilos
+
+logger = logging.getLogger(__name__)
+
+CLAVES_VENTANA = ("MES_TRAIN", "MES_VALIDACION", "MES_TEST")
+
+def ejecutar_experimento(indice: dict, experimento: dict) -> dict:
+    """
+    Corre la optimización y la evaluación en test de una ventana de meses sobre el índice compartido
+
+    Args:
+        indice: Índice por mes construido con construir_indice_meses
+        experimento: Diccionario con STUDY_NAME, las claves MES_TRAIN, MES_VALIDACION, MES_TEST
+                     y opcionalmente PERFIL y n_trials (si faltan, se usan los de conf.yaml)
+
+    Returns:
+        dict: Resumen del experimento (también se guarda en resultados_{STUDY_NAME}_experimento.json)
+    """
+    study_name = experimento["STUDY_NAME"]
+    ventana = {clave: experimento[clave] for clave in CLAVES_VENTANA if clave in experimento}
+    perfil = experimento.get("PERFIL", PERFIL)
+
+    logger.info(f"Experimento {study_name}: ventana {ventana}")
+    inicio = time.monotonic()
+
+    study = optimizar(indice, n_trials=experimento.get("n_trials"), study_name=study_name, perfil=perfil, ventana=ventana)
+    mejores_params = cargar_los_mejores_hiperparametros(archivo_base=study_name, perfil=perfil)
+    ganancia_test, envios_test = evaluar_en_test(indice, mejores_params, perfil=perfil, ventana=ventana)
+
+    resumen = {
+        "study_name": study_name,
+        "ventana": ventana,
+        "perfil": perfil,
+        "trials": len(study.trials),
+        "mejores_params": mejores_params,
+        "ganancia_test": ganancia_test,
+        "envios_test": envios_test,
+        "segundos": time.monotonic() - inicio,
+        "datetime": datetime.now().isoformat()
+    }
+
+    archivo = f"resultados_{study_name}_experimento.json"
+    with open(archivo, "w") as f:
+        json.dump(resumen, f, indent=2)
+
+    logger.info(f"Experimento {study_name} terminado: ganancia en test {ganancia_test:,.0f}. Guardado en {archivo}")
+
+    return resumen
+
+def ejecutar_barrido(indice: dict, experimentos: list[dict] = None, paralelo: int = None) -> list[dict]:
+    """
+    Compara varias ventanas de entrenamiento cargando y procesando los datos una sola vez.
+    Los experimentos corren en threads sobre el mismo índice en memoria (LightGBM libera el GIL
+    mientras entrena), así que no se copian los datos por experimento. El presupuesto de CPU
+    se reparte entre los experimentos en simultáneo.
+
+    Args:
+        indice: Índice por mes construido con construir_indice_meses
+        experimentos: Lista de experimentos (si es None, usa barrido.experimentos de conf.yaml)
+        paralelo: Experimentos en simultáneo (si es None, usa barrido.PARALELO de conf.yaml)
+
+    Returns:
+        list[dict]: Resumen de cada experimento, en el mismo orden (None si el experimento falló)
+    """
+    if experimentos is None:
+        experimentos = BARRIDO.get("experimentos", [])
+    if paralelo is None:
+        paralelo = BARRIDO.get("PARALELO", 1)
+
+    nombres = [experimento["STUDY_NAME"] for experimento in experimentos]
+    if len(set(nombres)) != len(nombres):
+        raise ValueError(f"Los STUDY_NAME de los experimentos deben ser únicos: {nombres}")
+
+    faltantes = {
+        mes
+        for experimento in experimentos
+        for clave in CLAVES_VENTANA
+        for mes in como_lista(experimento.get(clave, []))
+        if mes not in indice["rangos"]
+    }
+    if faltantes:
+        raise ValueError(f"Meses de los experimentos que no están en los datos: {sorted(faltantes)}")
+
+    logger.info(f"Iniciando barrido de {len(experimentos)} experimentos con {paralelo} en paralelo")
+
+    # Cada experimento corre a su vez TRIALS_EN_PARALELO trials: BLAS se reparte entre todos
+    trials_en_paralelo = RECURSOS.get("TRIALS_EN_PARALELO", 1)
+    with etapa_paralela(paralelo, tareas_anidadas=trials_en_paralelo) as hilos, ThreadPoolExecutor(max_workers=paralelo) as executor:
+        futuros = [
+            executor.submit(ejecutar_con_hilos, hilos, ejecutar_experimento, indice, experimento)
+            for experimento in experimentos
+        ]
+
+    resultados = []
+    for nombre, futuro in zip(nombres, futuros):
+        try:
+            resultados.append(futuro.result())
+        except Exception as e:
+            logger.exception(f"Error en el experimento {nombre}: {e}")
+            resultados.append(None)
+
+    return resultados
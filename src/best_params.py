@@ -4,18 +4,109 @@ import logging
 
 logger = logging.getLogger(__name__)
 
-def cargar_los_mejores_hiperparametros(archivo_base=None):
+def metrica_objetivo(modo_costo=None) -> str:
+    """
+    Nombre de la métrica que guarda el campo "value" de cada iteración. Los valores de
+    métricas distintas (umbral fijo de corridas anteriores, otra ventana de suavizado,
+    ganancia penalizada por tiempo) no son comparables entre sí.
+
+    Args:
+        modo_costo: ganancia | penalizado | multiobjetivo (si es None, usa objetivo_costo.MODO de conf.yaml)
+
+    Returns:
+        str: Nombre de la métrica
+    """
+    if modo_costo is None:
+        modo_costo = OBJETIVO_COSTO.get("MODO", "ganancia")
+
+    metrica = f"ganancia_suavizada_{VENTANA_SUAVIZADO:g}"
+    if modo_costo == "penalizado":
+        metrica += f"_penalizada_{OBJETIVO_COSTO.get('PENALIZACION_POR_SEGUNDO', 0):g}_por_segundo"
+    return metrica
+
+def filtrar_por_metrica(iteraciones, metrica=None) -> list:
+    """
+    Descarta las iteraciones guardadas con otra métrica (las de corridas anteriores sin
+    el campo "metrica" usaban el umbral fijo 0.025)
+
+    Args:
+        iteraciones: Iteraciones leídas del archivo JSON
+        metrica: Métrica a conservar (si es None, la del objetivo de conf.yaml)
+
+    Returns:
+        list: Iteraciones con la métrica pedida
+    """
+    if metrica is None:
+        metrica = metrica_objetivo()
+
+    filtradas = [iteracion for iteracion in iteraciones if iteracion.get("metrica") == metrica]
+    if len(filtradas) < len(iteraciones):
+        logger.info(f"Se descartan {len(iteraciones) - len(filtradas)} iteraciones guardadas con otra métrica (se usa {metrica})")
+
+    return filtradas
+
+def filtrar_por_perfil(iteraciones, perfil=None) -> list:
+    """
+    Descarta las iteraciones de otro perfil de entrenamiento: sus hiperparámetros no son
+    intercambiables (por ejemplo, un trial GOSS no muestrea bagging_fraction)
+
+    Args:
+        iteraciones: Iteraciones leídas del archivo JSON
+        perfil: Perfil a conservar (si es None, usa PERFIL de conf.yaml)
+
+    Returns:
+        list: Iteraciones del perfil pedido
+    """
+    if perfil is None:
+        perfil = PERFIL
+
+    filtradas = [
+        iteracion for iteracion in iteraciones
+        if iteracion.get("configuración", {}).get("perfil") == perfil
+    ]
+    if len(filtradas) < len(iteraciones):
+        logger.info(f"Se descartan {len(iteraciones) - len(filtradas)} iteraciones de otro perfil (se usa {perfil})")
+
+    return filtradas
+
+def filtrar_completas(iteraciones) -> list:
+    """
+    Descarta las iteraciones podadas por deadline: se guardan sólo por su telemetría
+    (tiempo, rounds alcanzados y memoria) y no tienen ganancia
+
+    Args:
+        iteraciones: Iteraciones leídas del archivo JSON
+
+    Returns:
+        list: Iteraciones terminadas
+    """
+    filtradas = [iteracion for iteracion in iteraciones if iteracion.get("state", "COMPLETE") == "COMPLETE"]
+    if len(filtradas) < len(iteraciones):
+        logger.info(f"Se descartan {len(iteraciones) - len(filtradas)} iteraciones podadas por deadline")
+
+    return filtradas
+
+def cargar_los_mejores_hiperparametros(archivo_base=None, segundos_maximos=None, metrica=None, perfil=None):
     """
     Carga los mejores hiperparámetros desde el archivo JSON de iteraciones de Optuna.
     
     Args:
         archivo_base: Nombre base (si es None, usa STUDY_NAME)
+        segundos_maximos: Sólo considera trials cuya telemetría registre a lo sumo estos segundos
+                          de dataset + entrenamiento (si es None, usa objetivo_costo.SEGUNDOS_MAXIMOS_MODELO;
+                          obligatorio en modo multiobjetivo)
+        metrica: Sólo considera iteraciones guardadas con esta métrica (si es None, la del objetivo de conf.yaml)
+        perfil: Sólo considera iteraciones de este perfil de entrenamiento (si es None, usa PERFIL de conf.yaml)
     
     Returns:
         dict: Mejores hiperparámetros encontrados
     """
     if archivo_base is None:
         archivo_base = STUDY_NAME
+    if segundos_maximos is None:
+        segundos_maximos = OBJETIVO_COSTO.get("SEGUNDOS_MAXIMOS_MODELO")
+    if segundos_maximos is None and OBJETIVO_COSTO.get("MODO") == "multiobjetivo":
+        raise ValueError("En modo multiobjetivo hay que fijar objetivo_costo.SEGUNDOS_MAXIMOS_MODELO para elegir el trial del frente de Pareto")
     
     archivo = f"resultados_{archivo_base}_iteraciones.json"
     
@@ -26,6 +117,22 @@ def cargar_los_mejores_hiperparametros(archivo_base=None):
         if not iteraciones: 
             raise ValueError("No se encontraron iteraciones en el archivo JSON")
 
+        # Sólo son comparables los valores de la misma métrica y el mismo perfil
+        iteraciones = filtrar_completas(filtrar_por_perfil(filtrar_por_metrica(iteraciones, metrica), perfil))
+        if not iteraciones:
+            raise ValueError(f"No hay iteraciones terminadas con la métrica {metrica or metrica_objetivo()} y el perfil {perfil or PERFIL} en {archivo}")
+
+        # Mejor modelo alcanzable dentro del presupuesto de cómputo. El trial de mayor ganancia
+        # entre los que entrenan en a lo sumo segundos_maximos siempre está en el frente de Pareto
+        if segundos_maximos is not None:
+            iteraciones = [
+                iteracion for iteracion in iteraciones
+                if iteracion.get("telemetria", {}).get("segundos_totales", float("inf")) <= segundos_maximos
+            ]
+            logger.info(f"Trials dentro de {segundos_maximos} s: {len(iteraciones)}")
+            if not iteraciones:
+                raise ValueError(f"Ningún trial entrenó en menos de {segundos_maximos} s")
+
         # Encontrar la iteración con la mayor ganancia
         mejor_iteracion = max(iteraciones, key=lambda x: x["value"])
         mejores_params = mejor_iteracion["params"]
@@ -65,8 +172,11 @@ def obtener_estadisticas_optuna(archivo_base=None):
 
     try:
         with open(archivo, 'r') as f:
-            iteraciones = json.load(f)
-            
+            iteraciones = filtrar_completas(filtrar_por_perfil(filtrar_por_metrica(json.load(f))))
+
+        if not iteraciones:
+            raise ValueError(f"No hay iteraciones terminadas con la métrica {metrica_objetivo()} y el perfil {PERFIL} en {archivo}")
+
         ganancias = [iter['value'] for iter in iteraciones]
 
         estadisticas = {
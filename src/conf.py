@@ -16,6 +16,15 @@ try:
         # Valores por defecto ? 
         STUDY_NAME = _cfgGeneral.get("STUDY_NAME","Wednesday")
         PARAMETROS_LGB = _cfgGeneral["parametros_lgb"]
+        PERFIL_LGB = _cfgGeneral.get("perfil_lgb", {})
+        PERFILES_LGB = PERFIL_LGB.get("perfiles", {})
+        PERFIL = PERFIL_LGB.get("PERFIL", "accurate")
+        RECURSOS = _cfgGeneral.get("recursos", {})
+        BARRIDO = _cfgGeneral.get("barrido", {})
+        OBJETIVO_COSTO = _cfgGeneral.get("objetivo_costo", {})
+        PRESUPUESTO_TIEMPO = _cfgGeneral.get("presupuesto_tiempo", {})
+        MATRIZ_DISPERSA = _cfgGeneral.get("matriz_dispersa", {})
+        REFRESCO_MODELO = _cfgGeneral.get("refresco_modelo", {})
         DATA_PATH = os.path.join(
             BASE_DIR,
             _cfg.get("DATA_PATH", "data/competencia.csv")
@@ -26,6 +35,7 @@ try:
         MES_TEST = _cfg.get("MES_TEST",[])
         GANANCIA_ACIERTO = _cfg.get("GANANCIA_ACIERTO",None)
         COSTO_ESTIMULO = _cfg.get("COSTO_ESTIMULO",None)
+        VENTANA_SUAVIZADO = _cfg.get("VENTANA_SUAVIZADO", 0.01)
         FINAL_TRAIN = _cfg.get("FINAL_TRAIN", [])
         FINAL_PREDICT = _cfg.get("FINAL_PREDICT",[])
 
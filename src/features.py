@@ -1,6 +1,7 @@
 import pandas as pd
 import duckdb
 import logging
+from .recursos import hilos_disponibles
 
 logger = logging.getLogger("__name__")
 
@@ -47,7 +48,7 @@ def feature_engineering_lag(df: pd.DataFrame, columnas: list[str], cant_lag: int
     logger.debug(f"Consulta SQL generada: {sql}")
 
     # Ejecutar la consulta
-    con = duckdb.connect(database=":memory:")
+    con = duckdb.connect(database=":memory:", config={"threads": hilos_disponibles()})
     con.register("df", df)
     df = con.execute(sql).df()
     con.close()
@@ -3,10 +3,15 @@ import lightgbm as lgb
 import numpy as np
 import logging
 import os
+import json
 from datetime import datetime
-from .conf import FINAL_TRAIN, FINAL_PREDICT, SEMILLA
+import glob
+from .conf import FINAL_TRAIN, FINAL_PREDICT, SEMILLA, REFRESCO_MODELO
 from .best_params import cargar_los_mejores_hiperparametros
-from .gain_function import calcular_ganancia, ganancia_lgb_binary
+from .gain_function import ganancia_lgb_binary, analizar_curva
+from .perfiles import combinar_con_perfil
+from .recursos import hilos_disponibles
+from .indice_meses import asegurar_indice, particion, clientes, como_lista
 
 logger = logging.getLogger(__name__)
 
@@ -15,37 +20,54 @@ def preparar_datos_entrenamiento_final(df):
     Prepara los datos para el entrenamiento final usando todos los meses de FINAL_TRAIN
 
     Args:
-        df: DataFrame con los datos
+        df: DataFrame con los datos o índice por mes ya construido
     
     Returns:
         tuple: (X_train, y_train, X_predict, clientes_predict)
     """
     logger.info(f"Preparando datos para el entrenamiento final usando los meses {FINAL_TRAIN}")
-    logger.info(f"Preparando datos para la predicción usando los meses {FINAL_PREDICT}")
+
+    indice = asegurar_indice(df)
     
-    # Filtrar los datos para el entrenamiento final
-    X_train = df[df['foto_mes'].isin(FINAL_TRAIN)]
-    y_train = X_train['clase_ternaria']
-    X_train = X_train.drop('clase_ternaria', axis=1)
+    # Datos para el entrenamiento final
+    X_train, y_train = particion(indice, FINAL_TRAIN)
     
-    # Filtrar los datos para la predicción
-    X_predict = df[df['foto_mes'].isin(FINAL_PREDICT)]
-    X_predict = X_predict.drop('clase_ternaria', axis=1)
-
-    # Filtrar los datos para la predicción
-    clientes_predict = X_predict['numero_de_cliente'].unique()
+    # Datos para la predicción
+    X_predict, clientes_predict = preparar_datos_prediccion(indice)
     
     return X_train, y_train, X_predict, clientes_predict
 
+def preparar_datos_prediccion(df):
+    """
+    Prepara los datos para la predicción usando los meses de FINAL_PREDICT
+    (en el refresco incremental no hace falta armar FINAL_TRAIN)
+
+    Args:
+        df: DataFrame con los datos o índice por mes ya construido
 
-def entrenar_modelo_final(X_train, y_train, mejores_params):
+    Returns:
+        tuple: (X_predict, clientes_predict)
+    """
+    logger.info(f"Preparando datos para la predicción usando los meses {FINAL_PREDICT}")
+
+    indice = asegurar_indice(df)
+    X_predict, _ = particion(indice, FINAL_PREDICT)
+
+    # Clientes alineados con las filas de X_predict
+    clientes_predict = clientes(indice, FINAL_PREDICT)
+
+    return X_predict, clientes_predict
+
+
+def entrenar_modelo_final(X_train, y_train, mejores_params, feature_name="auto"):
     """
     Entrena el modelo final usando los mejores hiperparámetros encontrados
 
     Args:
-        X_train: DataFrame con los datos de entrenamiento
+        X_train: Matriz con los datos de entrenamiento
         y_train: Array con las etiquetas de entrenamiento
         mejores_params: Diccionario con los mejores hiperparámetros encontrados por Optuna
+        feature_name: Nombres de las features (del índice por mes)
 
     Returns:
         lgb.Booster: Modelo entrenado
@@ -53,18 +75,12 @@ def entrenar_modelo_final(X_train, y_train, mejores_params):
     logger.info("Iniciando entrenamiento del modelo final con los mejores hiperparámetros")
 
     # Configurar los parámetros del modelo
-    params ={
-        'objective': 'binary',
-        'metric': None, # Usamos nuestra métrica personalizada
-        'random_state': SEMILLA[0],
-        'verbose': -1,
-        **mejores_params
-    }
+    params = _parametros_modelo(mejores_params)
 
     logger.info(f"Parámetros del modelo: {params}")
 
     # Crear el dataset de entrenamiento
-    train_data = lgb.Dataset(X_train, label=y_train)
+    train_data = lgb.Dataset(X_train, label=y_train, feature_name=feature_name)
 
     # Estimar el modelo
     logger.info("Entrenando el modelo final")
@@ -77,26 +93,262 @@ def entrenar_modelo_final(X_train, y_train, mejores_params):
     
     return model
 
-def generar_predicciones_finales(modelo, X_predict, clientes_predict, umbral=0.025):
+def _parametros_modelo(mejores_params):
+    """
+    Arma los parámetros de LightGBM para el modelo final a partir de los mejores hiperparámetros
+    y el perfil de entrenamiento de conf.yaml
+    """
+    return {
+        'objective': 'binary',
+        'metric': None, # Usamos nuestra métrica personalizada
+        'random_state': SEMILLA[0],
+        'verbose': -1,
+        **combinar_con_perfil(mejores_params)
+    }
+
+def cargar_modelo_final(ruta_archivo=None):
+    """
+    Carga un modelo guardado con guardar_modelo_final junto con los meses con los que se entrenó
+
+    Args:
+        ruta_archivo: Ruta del modelo (si es None, usa el modelo_*.txt más reciente de src/models)
+
+    Returns:
+        tuple: (lgb.Booster, meses de entrenamiento o None si el modelo no tiene registro de meses)
+    """
+    if ruta_archivo is None:
+        DIR_GUARDADO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        carpeta_modelos = os.path.join(DIR_GUARDADO, "src", "models")
+        # El timestamp del nombre ordena cronológicamente
+        modelos = sorted(glob.glob(os.path.join(carpeta_modelos, "modelo_*.txt")))
+        if not modelos:
+            raise FileNotFoundError(f"No hay modelos guardados en {carpeta_modelos}")
+        ruta_archivo = modelos[-1]
+
+    logger.info(f"Cargando modelo desde: {ruta_archivo}")
+
+    meses = None
+    ruta_meses = _ruta_meses_modelo(ruta_archivo)
+    if os.path.exists(ruta_meses):
+        with open(ruta_meses, "r") as f:
+            meses = json.load(f).get("meses_entrenamiento")
+        logger.info(f"Meses de entrenamiento del modelo: {meses}")
+    else:
+        logger.warning(f"El modelo no tiene registro de meses de entrenamiento ({ruta_meses})")
+
+    return lgb.Booster(model_file=ruta_archivo), meses
+
+def _ruta_meses_modelo(ruta_archivo):
+    """
+    Ruta del JSON con los meses de entrenamiento que acompaña a cada modelo guardado
+    """
+    return os.path.splitext(ruta_archivo)[0] + "_meses.json"
+
+def entrenar_modelo_incremental(X_train, y_train, modelo_previo, mejores_params, modo=None, feature_name="auto"):
+    """
+    Actualiza un modelo ya entrenado en lugar de reentrenar desde cero
+
+    Args:
+        X_train: Matriz con los datos nuevos (continuar) o la ventana extendida (refit)
+        y_train: Array con las etiquetas de entrenamiento
+        modelo_previo: lgb.Booster a actualizar
+        mejores_params: Diccionario con los mejores hiperparámetros encontrados por Optuna
+        modo: "continuar" agrega árboles sobre el modelo previo (init_model),
+              "refit" reajusta los valores de las hojas manteniendo la estructura de los árboles
+              (si es None, usa el de conf.yaml)
+        feature_name: Nombres de las features (del índice por mes)
+
+    Returns:
+        lgb.Booster: Modelo actualizado
+    """
+    if modo is None:
+        modo = REFRESCO_MODELO.get("MODO", "continuar")
+
+    logger.info(f"Actualizando el modelo en modo {modo} con {X_train.shape[0]} registros")
+
+    if modo == "continuar":
+        train_data = lgb.Dataset(X_train, label=y_train, feature_name=feature_name)
+        # Los rounds del refresco reemplazan a los del entrenamiento completo
+        params = {k: v for k, v in _parametros_modelo(mejores_params).items() if k != "num_boost_round"}
+        model = lgb.train(
+            params,
+            train_data,
+            num_boost_round=REFRESCO_MODELO.get("ROUNDS_INCREMENTALES", 100),
+            init_model=modelo_previo,
+            feval=ganancia_lgb_binary
+        )
+    elif modo == "refit":
+        model = modelo_previo.refit(
+            X_train,
+            y_train,
+            decay_rate=REFRESCO_MODELO.get("DECAY_RATE", 0.9),
+            num_threads=hilos_disponibles() # refit predice las hojas de toda la ventana antes de reajustarlas
+        )
+    else:
+        raise ValueError(f"Modo de actualización desconocido: {modo}")
+
+    return model
+
+def _ganancia_en_meses(modelo, indice, meses):
+    """
+    Calcula la ganancia del modelo sobre los meses indicados, en el corte óptimo de la curva suavizada
+    """
+    X_eval, y_eval = particion(indice, meses)
+    y_pred_proba = modelo.predict(X_eval, num_threads=hilos_disponibles())
+
+    return float(analizar_curva(y_eval, y_pred_proba)["ganancia_suavizada"])
+
+def validar_meses_refresco(meses_modelo, meses_previos, meses_nuevos, mes_holdout):
+    """
+    Verifica que el mes de holdout del guardarraíl no lo haya visto ningún modelo.
+    Los meses del modelo previo se toman de lo que se guardó junto al modelo
+    (guardar_modelo_final) y tienen que coincidir con MESES_MODELO_PREVIO de conf.yaml.
+    Si no, la ganancia en holdout es in-sample y el guardarraíl no puede fallar.
+
+    Args:
+        meses_modelo: Meses con los que se entrenó el modelo cargado (None si no hay registro)
+        meses_previos: MESES_MODELO_PREVIO de conf.yaml
+        meses_nuevos: Meses que se agregan en el refresco
+        mes_holdout: Meses reservados para el guardarraíl
+    """
+    if not mes_holdout:
+        raise ValueError("refresco_modelo.MES_HOLDOUT no puede estar vacío")
+    if not meses_nuevos:
+        raise ValueError("refresco_modelo.MESES_NUEVOS no puede estar vacío")
+    if meses_modelo is None:
+        raise ValueError("No se sabe con qué meses se entrenó el modelo previo: no se puede garantizar un holdout fuera de muestra")
+
+    if sorted(meses_modelo) != sorted(meses_previos):
+        raise ValueError(
+            f"El modelo previo se entrenó con {sorted(meses_modelo)} pero refresco_modelo.MESES_MODELO_PREVIO "
+            f"dice {sorted(meses_previos)}"
+        )
+
+    en_nuevos = sorted(set(mes_holdout) & set(meses_nuevos))
+    if en_nuevos:
+        raise ValueError(f"El mes de holdout {en_nuevos} está en MESES_NUEVOS: el guardarraíl evaluaría in-sample")
+
+    en_previos = sorted(set(mes_holdout) & set(meses_modelo))
+    if en_previos:
+        raise ValueError(f"El mes de holdout {en_previos} ya lo vio el modelo previo")
+
+    # El refresco cubre los mismos meses que un entrenamiento final completo
+    meses_refresco = set(meses_previos) | set(meses_nuevos) | set(mes_holdout)
+    if meses_refresco != set(FINAL_TRAIN):
+        raise ValueError(
+            f"MESES_MODELO_PREVIO + MESES_NUEVOS + MES_HOLDOUT = {sorted(meses_refresco)} no coincide "
+            f"con FINAL_TRAIN = {sorted(FINAL_TRAIN)}"
+        )
+
+def refrescar_modelo_final(df, mejores_params, modelo_previo, meses_modelo):
+    """
+    Refresca el modelo final cuando llega un mes nuevo, actualizando el modelo previo
+    en lugar de reentrenar sobre toda la ventana.
+
+    El modelo previo se entrenó con MESES_MODELO_PREVIO (se verifica contra los meses
+    guardados con el modelo) y se actualiza con MESES_NUEVOS. MES_HOLDOUT queda fuera
+    de ambos y no se usa para entrenar: es el mes con el que el guardarraíl evalúa
+    exactamente el modelo que se devuelve, contra una referencia:
+    - VERIFICAR_CON_REENTRENAMIENTO = false (por defecto): el modelo previo. Chequeo barato,
+      el refresco cuesta una fracción del reentrenamiento
+    - VERIFICAR_CON_REENTRENAMIENTO = true: un reentrenamiento completo sobre
+      MESES_MODELO_PREVIO + MESES_NUEVOS (también sin el holdout). Cuesta más que
+      reentrenar directamente; sirve para auditar el refresco de vez en cuando
+    Si el incremental pierde más que TOLERANCIA contra la referencia, se devuelve
+    el reentrenamiento completo.
+
+    Args:
+        df: DataFrame con los datos o índice por mes ya construido
+        mejores_params: Diccionario con los mejores hiperparámetros encontrados por Optuna
+        modelo_previo: lgb.Booster entrenado en la corrida anterior
+        meses_modelo: Meses con los que se entrenó modelo_previo (de cargar_modelo_final)
+
+    Returns:
+        tuple: (modelo refrescado o reentrenado, meses con los que se entrenó)
+    """
+    modo = REFRESCO_MODELO.get("MODO", "continuar")
+    meses_previos = como_lista(REFRESCO_MODELO.get("MESES_MODELO_PREVIO", []))
+    meses_nuevos = como_lista(REFRESCO_MODELO.get("MESES_NUEVOS", []))
+    mes_holdout = como_lista(REFRESCO_MODELO.get("MES_HOLDOUT", []))
+    tolerancia = REFRESCO_MODELO.get("TOLERANCIA", 0.05)
+    verificar = REFRESCO_MODELO.get("VERIFICAR_CON_REENTRENAMIENTO", False)
+
+    validar_meses_refresco(meses_modelo, meses_previos, meses_nuevos, mes_holdout)
+
+    logger.info(f"Refrescando el modelo final en modo {modo}: previo {meses_previos}, meses nuevos {meses_nuevos}")
+    logger.info(f"Mes de holdout para el guardarraíl (no se usa para entrenar): {mes_holdout}")
+
+    indice = asegurar_indice(df)
+    meses_ventana = meses_previos + [mes for mes in meses_nuevos if mes not in meses_previos]
+
+    # continuar sólo ve los meses nuevos, refit reajusta sobre toda la ventana extendida
+    meses_actualizacion = meses_nuevos if modo == "continuar" else meses_ventana
+
+    # Candidato incremental: es el modelo que se devuelve si pasa el guardarraíl
+    X_candidato, y_candidato = particion(indice, meses_actualizacion)
+    candidato = entrenar_modelo_incremental(
+        X_candidato,
+        y_candidato,
+        modelo_previo,
+        mejores_params,
+        modo=modo,
+        feature_name=indice["columnas"]
+    )
+    ganancia_candidato = _ganancia_en_meses(candidato, indice, mes_holdout)
+
+    # Reentrenamiento completo sobre la misma ventana, sin el holdout
+    def reentrenar():
+        X_ventana, y_ventana = particion(indice, meses_ventana)
+        return entrenar_modelo_final(X_ventana, y_ventana, mejores_params, feature_name=indice["columnas"])
+
+    # Referencia contra la que se compara el candidato
+    if verificar:
+        referencia = reentrenar()
+        nombre_referencia = "reentrenamiento completo"
+    else:
+        referencia = modelo_previo
+        nombre_referencia = "modelo previo"
+    ganancia_referencia = _ganancia_en_meses(referencia, indice, mes_holdout)
+
+    logger.info(f"Ganancia en holdout - incremental: {ganancia_candidato:,.0f}, {nombre_referencia}: {ganancia_referencia:,.0f}")
+
+    if ganancia_candidato < ganancia_referencia - tolerancia * abs(ganancia_referencia):
+        logger.warning(f"El modelo incremental no pasa el guardarraíl (tolerancia {tolerancia:.0%}). Se reentrena desde cero")
+        return (referencia if verificar else reentrenar()), meses_ventana
+
+    logger.info("El modelo incremental pasa el guardarraíl")
+    return candidato, meses_ventana
+
+def generar_predicciones_finales(modelo, X_predict, clientes_predict, umbral=0.025, envios=None):
     """
     Genera las predicciones finales usando el modelo entrenado para el mes objetivo
     
     Args:
         modelo: Modelo entrenado
-        X_predict: DataFrame con los datos de predicción
+        X_predict: Matriz con los datos de predicción
         clientes_predict: Array con los IDs de los clientes
-        umbral: Umbral de probabilidad para clasificar como positivo (clasificación binaria)
+        umbral: Umbral de probabilidad para clasificar como positivo (se usa si envios es None)
+        envios: Cantidad de clientes a estimular (los de mayor probabilidad), por ejemplo
+                el corte óptimo de evaluar_en_test
     
     Returns:
         pd.DataFrame: DataFrame con numero_cliente y predict
     """
     logger.info("Generando predicciones finales")
-    
+
+    if envios is not None and envios < 1:
+        raise ValueError(f"La cantidad de envíos debe ser al menos 1: {envios}")
+
     # Predecir probabilidades
-    y_pred_proba = modelo.predict(X_predict)
+    y_pred_proba = modelo.predict(X_predict, num_threads=hilos_disponibles())
 
-    # binarizar la probabilidad de y_pred_proba
-    predict = (y_pred_proba > umbral).astype(int)
+    if envios is not None:
+        # Top-N por probabilidad
+        predict = np.zeros(len(y_pred_proba), dtype=int)
+        predict[np.argsort(-y_pred_proba, kind="stable")[:envios]] = 1
+    else:
+        # binarizar la probabilidad de y_pred_proba
+        predict = (y_pred_proba > umbral).astype(int)
     
     # Crear DataFrame con las predicciones
     predicciones = pd.DataFrame({
@@ -107,7 +359,10 @@ def generar_predicciones_finales(modelo, X_predict, clientes_predict, umbral=0.0
     logger.info(f"Predicciones generadas para {len(clientes_predict)} clientes")
     logger.info(f"Predicciones positivas: {predict.sum()}")
     logger.info(f"Predicciones negativas: {(1 - predict).sum()}")
-    logger.info(f"Umbral de probabilidad: {umbral}")
+    if envios is not None:
+        logger.info(f"Envíos (top-N por probabilidad): {envios}")
+    else:
+        logger.info(f"Umbral de probabilidad: {umbral}")
     
     return predicciones
 
@@ -138,13 +393,15 @@ def guardar_predicciones_finales(predicciones, nombre_archivo=None):
     
     return ruta_archivo
 
-def guardar_modelo_final(modelo, nombre_archivo=None):
+def guardar_modelo_final(modelo, nombre_archivo=None, meses_entrenamiento=None):
     """
     Guarda el modelo entrenado en un archivo .txt
     
     Args:
         modelo: Modelo entrenado
         nombre_archivo: Nombre del archivo (si es None, usa STUDY_NAME)
+        meses_entrenamiento: Meses con los que se entrenó el modelo. Se guardan en un JSON
+                             al lado del modelo (los usa el guardarraíl del refresco incremental)
     
     Returns:
         str: Ruta del archivo guardado
@@ -160,7 +417,11 @@ def guardar_modelo_final(modelo, nombre_archivo=None):
     
     # Guardar el archivo
     modelo.save_model(ruta_archivo)
+
+    if meses_entrenamiento is not None:
+        with open(_ruta_meses_modelo(ruta_archivo), "w") as f:
+            json.dump({"meses_entrenamiento": como_lista(meses_entrenamiento)}, f, indent=2)
     
     logger.info(f"Modelo guardado en: {ruta_archivo}")
     
-    return ruta_archivo
\ No newline at end of file
+    return ruta_archivo
@@ -1,6 +1,6 @@
 import numpy as np
 import pandas as pd
-from .conf import GANANCIA_ACIERTO, COSTO_ESTIMULO
+from .conf import GANANCIA_ACIERTO, COSTO_ESTIMULO, VENTANA_SUAVIZADO
 import logging
 
 logger = logging.getLogger(__name__)
@@ -37,14 +37,131 @@ def calcular_ganancia(y_true, y_pred):
     """
     return ganancia_total
 
+def curva_ganancia(y_true, y_score):
+    """
+    Curva de ganancia en función de la cantidad de estímulos: ordena los scores una sola vez
+    (O(n log n)) y acumula la ganancia de estimular a los k clientes con mayor score.
+    Acepta varios modelos/semillas a la vez sobre las mismas etiquetas.
+
+    Args:
+        y_true: Array con las etiquetas reales (0 o 1), forma (n,)
+        y_score: Scores de un modelo, forma (n,), o de varios modelos, forma (m, n)
+
+    Returns:
+        np.ndarray: Ganancia acumulada, forma (n + 1,) o (m, n + 1); la posición k es la
+        ganancia de estimular a los k primeros (la posición 0 vale 0)
+    """
+    y_true = np.asarray(y_true)
+    scores = np.asarray(y_score)
+    un_modelo = scores.ndim == 1
+    scores = np.atleast_2d(scores)
+
+    # Orden descendente estable por fila
+    orden = np.argsort(-scores, axis=1, kind="stable")
+    ganancias = np.where(y_true[orden] == 1, GANANCIA_ACIERTO, -COSTO_ESTIMULO)
+
+    curva = np.zeros((scores.shape[0], scores.shape[1] + 1))
+    np.cumsum(ganancias, axis=1, out=curva[:, 1:])
+
+    return curva[0] if un_modelo else curva
+
+def suavizar_curva(curva, ventana=None):
+    """
+    Media móvil centrada de la curva de ganancia (bordes repetidos), calculada con sumas acumuladas.
+    El ancho de la media móvil es una fracción de los registros evaluados, así el suavizado
+    se comporta igual en un mes de muestra que en un mes completo.
+
+    Args:
+        curva: Curva de curva_ganancia, forma (n + 1,) o (m, n + 1)
+        ventana: Fracción de los registros que abarca la media móvil, en (0, 1]
+                 (si es None, usa VENTANA_SUAVIZADO de conf.yaml)
+
+    Returns:
+        np.ndarray: Curva suavizada, misma forma que curva
+    """
+    if ventana is None:
+        ventana = VENTANA_SUAVIZADO
+    if not 0 < ventana <= 1:
+        raise ValueError(f"La ventana de suavizado es una fracción de los registros en (0, 1]: {ventana}")
+
+    curva = np.asarray(curva, dtype=float)
+    largo = curva.shape[-1]
+    # Ventana impar, de al menos un punto y no más larga que la curva
+    puntos = max(1, min(int(round(ventana * (largo - 1))), largo))
+    puntos -= (puntos + 1) % 2
+    medio = puntos // 2
+
+    relleno = [(0, 0)] * (curva.ndim - 1) + [(medio, medio)]
+    acumulada = np.cumsum(np.pad(curva, relleno, mode="edge"), axis=-1)
+    acumulada = np.concatenate([np.zeros(curva.shape[:-1] + (1,)), acumulada], axis=-1)
+
+    return (acumulada[..., puntos:] - acumulada[..., :-puntos]) / puntos
+
+def ganancia_en_umbrales(y_true, y_score, umbrales):
+    """
+    Ganancia de estimular a los clientes con score >= umbral, para varios umbrales a la vez
+
+    Args:
+        y_true: Array con las etiquetas reales (0 o 1), forma (n,)
+        y_score: Scores, forma (n,) o (m, n)
+        umbrales: Umbrales de probabilidad
+
+    Returns:
+        np.ndarray: Ganancia por umbral, forma (len(umbrales),) o (m, len(umbrales))
+    """
+    scores = np.asarray(y_score)
+    un_modelo = scores.ndim == 1
+    scores = np.atleast_2d(scores)
+    umbrales = np.asarray(umbrales, dtype=float)
+
+    curva = np.atleast_2d(curva_ganancia(y_true, scores))
+    scores_ordenados = np.sort(scores, axis=1)
+
+    # Cantidad de scores >= umbral, vía búsqueda binaria sobre los scores ordenados
+    envios = np.stack([
+        fila.size - np.searchsorted(fila, umbrales, side="left")
+        for fila in scores_ordenados
+    ])
+    resultado = np.take_along_axis(curva, envios, axis=1)
+
+    return resultado[0] if un_modelo else resultado
+
+def analizar_curva(y_true, y_score, ventana=None):
+    """
+    Corte óptimo de la curva de ganancia: máximo exacto y máximo de la curva suavizada
+    (más estable frente al ruido de unos pocos clientes). El corte es de al menos un envío.
+
+    Args:
+        y_true: Array con las etiquetas reales (0 o 1), forma (n,)
+        y_score: Scores, forma (n,) o (m, n)
+        ventana: Fracción de los registros para el suavizado (si es None, usa VENTANA_SUAVIZADO de conf.yaml)
+
+    Returns:
+        dict: envios_optimos, ganancia_maxima, envios_suavizado y ganancia_suavizada
+        (escalares para un modelo, arrays de largo m para varios)
+    """
+    curva = curva_ganancia(y_true, y_score)
+    suavizada = suavizar_curva(curva, ventana)
+
+    # Se excluye la posición 0 (no estimular a nadie) para que el corte siempre tenga envíos
+    envios_optimos = np.argmax(curva[..., 1:], axis=-1) + 1
+    envios_suavizado = np.argmax(suavizada[..., 1:], axis=-1) + 1
+
+    return {
+        "envios_optimos": envios_optimos,
+        "ganancia_maxima": np.max(curva[..., 1:], axis=-1),
+        "envios_suavizado": envios_suavizado,
+        "ganancia_suavizada": np.max(suavizada[..., 1:], axis=-1)
+    }
+
 def ganancia_lgb_binary(y_pred, y_true):
     """
-    Función de ganancia para LightGBM con predicciones binarias.
+    Función de ganancia para LightGBM: máximo de la curva de ganancia suavizada.
     Compatible con callbacks de LightGBM.
     
     Args:
-        y_pred: Array con las predicciones binarias (0 o 1)
-        y_true: Array con las etiquetas reales (0 o 1)
+        y_pred: Array con las probabilidades predichas
+        y_true: Dataset de LightGBM con las etiquetas reales (0 o 1)
         
     Returns:
         tuple: (eval_name, eval_result, is_higher_better)
@@ -52,12 +169,8 @@ def ganancia_lgb_binary(y_pred, y_true):
     # Obtener labels verdaderos
     y_true_labels = y_true.get_label()
 
-    # Convertir probabilidades a predicciones binarias (umbral 0.025)
-    y_pred_binary = (y_pred >= 0.025).astype(int)
-    
-    # Calcular ganancia usando configuración
-    ganancia_total = calcular_ganancia(y_true_labels, y_pred_binary)
+    # Ganancia en el corte óptimo, sin umbral fijo de probabilidad
+    ganancia_total = analizar_curva(y_true_labels, y_pred)["ganancia_suavizada"]
     
     # Retornar tuple para LightGBM
-    return "ganancia", ganancia_total, True # True = higher is better
-
+    return "ganancia", ganancia_total, True # True = higher is better
\ No newline at end of file
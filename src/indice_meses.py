@@ -0,0 +1,244 @@
+import pandas as pd
+import numpy as np
+import scipy.sparse as sp
+import logging
+import threading
+from .conf import MATRIZ_DISPERSA
+
+logger = logging.getLogger(__name__)
+
+# Los experimentos de un barrido comparten el índice desde varios threads
+_lock_particiones = threading.Lock()
+
+def construir_indice_meses(df: pd.DataFrame, target: str = "clase_ternaria", dispersa=None) -> dict:
+    """
+    Construye una única vez el índice por mes que comparten optimización, evaluación en test
+    y entrenamiento final. Ordena las filas por foto_mes para que cada mes ocupe un rango
+    contiguo y precalcula las features y el vector de etiquetas.
+
+    Las features se guardan en dos bloques: las columnas con muchos ceros en una matriz CSR
+    y el resto en una matriz densa (ver elegir_representacion). Las columnas se reordenan
+    una sola vez, primero las densas y después las dispersas, y "columnas" sigue ese orden
+    (es el feature_name de LightGBM). La CSR se arma columna por columna, sin materializar
+    antes la matriz densa. Una vez construido el índice, el DataFrame se puede liberar.
+
+    Args:
+        df: DataFrame con los datos (incluye foto_mes y la columna target)
+        target: Nombre de la columna con la etiqueta
+        dispersa: True/False fuerza todas las columnas a CSR/densa, "auto" decide columna
+                  por columna (si es None, usa matriz_dispersa.ACTIVAR de conf.yaml)
+
+    Returns:
+        dict: {
+            "densa": columnas densas ordenadas por foto_mes (np.ndarray o None),
+            "dispersa": columnas dispersas ordenadas por foto_mes (sp.csr_matrix o None),
+            "y": vector de etiquetas,
+            "clientes": numero_de_cliente de cada fila,
+            "columnas": nombres de las features (densas y después dispersas),
+            "rangos": {foto_mes: (inicio, fin)},
+            "particiones": caché de las particiones armadas para índices mixtos
+        }
+    """
+    logger.info("Construyendo índice por mes")
+
+    if "foto_mes" not in df.columns:
+        raise ValueError("Falta la columna foto_mes")
+
+    # Orden estable: dentro de cada mes se conserva el orden original
+    orden = np.argsort(df["foto_mes"].to_numpy(), kind="stable")
+    foto_mes = df["foto_mes"].to_numpy()[orden]
+
+    columnas = [c for c in df.columns if c != target]
+
+    if dispersa is None:
+        dispersa = MATRIZ_DISPERSA.get("ACTIVAR", "auto")
+    if dispersa == "auto":
+        columnas_dispersas = set(elegir_representacion(df, columnas))
+    else:
+        columnas_dispersas = set(columnas) if dispersa else set()
+
+    columnas_densas = [c for c in columnas if c not in columnas_dispersas]
+    columnas_dispersas = [c for c in columnas if c in columnas_dispersas]
+
+    densa = None
+    if columnas_densas:
+        densa = np.ascontiguousarray(df[columnas_densas].to_numpy(dtype=np.float64)[orden])
+    matriz_dispersa = None
+    if columnas_dispersas:
+        matriz_dispersa = _matriz_dispersa(df, columnas_dispersas, orden)
+
+    if target in df.columns:
+        y = df[target].to_numpy(dtype=np.float64)[orden]
+    else:
+        y = np.full(len(df), np.nan)
+    clientes = df["numero_de_cliente"].to_numpy()[orden]
+
+    meses, inicios, conteos = np.unique(foto_mes, return_index=True, return_counts=True)
+    rangos = {int(mes): (int(inicio), int(inicio + conteo)) for mes, inicio, conteo in zip(meses, inicios, conteos)}
+
+    bytes_features = sum(_bytes_matriz(X) for X in (densa, matriz_dispersa) if X is not None)
+    logger.info(f"Índice construido: {len(orden)} filas, {len(columnas)} features, meses {list(rangos)}")
+    logger.info(
+        f"Features: {len(columnas_densas)} columnas densas y {len(columnas_dispersas)} en CSR, "
+        f"{bytes_features / 1e6:,.1f} MB (densa completa: {8 * len(orden) * len(columnas) / 1e6:,.1f} MB)"
+    )
+
+    return {
+        "densa": densa,
+        "dispersa": matriz_dispersa,
+        "y": y,
+        "clientes": clientes,
+        "columnas": columnas_densas + columnas_dispersas,
+        "rangos": rangos,
+        "particiones": {}
+    }
+
+def elegir_representacion(df: pd.DataFrame, columnas: list[str]) -> list[str]:
+    """
+    Elige columna por columna cuáles guardar en CSR a partir de su densidad (fracción de no-ceros).
+    En CSR cada valor no nulo ocupa 12 bytes (float64 + índice int32) contra 8 bytes por celda en densa,
+    así que una columna de densidad d ahorra 1 - 1.5 d de su memoria. Va a CSR si ese ahorro
+    alcanza matriz_dispersa.AHORRO_MINIMO; el resto queda en la matriz densa.
+
+    Args:
+        df: DataFrame con los datos
+        columnas: Columnas de features
+
+    Returns:
+        list[str]: Columnas que conviene guardar en CSR
+    """
+    n_filas = len(df)
+    if n_filas == 0 or not columnas:
+        return []
+
+    densidades = pd.Series({c: np.count_nonzero(df[c].to_numpy() != 0) / n_filas for c in columnas})
+    ahorros = 1 - 1.5 * densidades
+    dispersas = list(ahorros.index[ahorros >= MATRIZ_DISPERSA.get("AHORRO_MINIMO", 0.3)])
+
+    # Ahorro total: sólo las columnas dispersas cambian de representación
+    ahorro_total = (ahorros[dispersas].sum() / len(columnas)) if dispersas else 0.0
+    logger.info(f"Columnas en CSR: {len(dispersas)} de {len(columnas)}")
+    logger.info(f"Ahorro estimado de memoria de las features: {ahorro_total:.1%}")
+
+    return dispersas
+
+def _matriz_dispersa(df: pd.DataFrame, columnas: list[str], orden: np.ndarray) -> sp.csr_matrix:
+    """
+    Arma la matriz CSR columna por columna (NaN se guarda como valor explícito, igual que en densa)
+    """
+    data, indices, indptr = [], [], [0]
+    for c in columnas:
+        valores = df[c].to_numpy(dtype=np.float64)[orden]
+        filas = np.flatnonzero(valores != 0)
+        data.append(valores[filas])
+        indices.append(filas.astype(np.int32))
+        indptr.append(indptr[-1] + len(filas))
+
+    X = sp.csc_matrix(
+        (np.concatenate(data), np.concatenate(indices), np.array(indptr, dtype=np.int64)),
+        shape=(len(orden), len(columnas))
+    )
+
+    # CSR: las filas de cada mes quedan contiguas en data/indices
+    return X.tocsr()
+
+def _bytes_matriz(X) -> int:
+    """
+    Memoria ocupada por la matriz de features
+    """
+    if sp.issparse(X):
+        return X.data.nbytes + X.indices.nbytes + X.indptr.nbytes
+    return X.nbytes
+
+def _filas_csr(X: sp.csr_matrix, filas: slice) -> sp.csr_matrix:
+    """
+    Filas contiguas de una matriz CSR como vista de data/indices (sólo se recalcula indptr)
+    """
+    inicio, fin = X.indptr[filas.start], X.indptr[filas.stop]
+    vista = sp.csr_matrix((filas.stop - filas.start, X.shape[1]), dtype=X.dtype)
+    # Se asignan los arrays directamente: el constructor de scipy copia (prune) los
+    # slices chicos de arrays grandes
+    vista.data = X.data[inicio:fin]
+    vista.indices = X.indices[inicio:fin]
+    vista.indptr = X.indptr[filas.start:filas.stop + 1] - inicio
+    return vista
+
+def asegurar_indice(datos) -> dict:
+    """
+    Devuelve el índice por mes, construyéndolo si se recibe un DataFrame
+    """
+    if isinstance(datos, pd.DataFrame):
+        return construir_indice_meses(datos)
+    return datos
+
+def como_lista(meses) -> list:
+    """
+    Normaliza un mes o una lista de meses (tal como vienen de conf.yaml) a una lista plana
+    """
+    if isinstance(meses, (list, tuple)):
+        return [mes for grupo in meses for mes in como_lista(grupo)]
+    return [meses]
+
+def _filas(indice: dict, meses) -> slice | np.ndarray:
+    """
+    Filas de los meses pedidos: un slice si los meses son contiguos en el índice
+    (vista sin copia) o un array de posiciones si no lo son
+    """
+    rangos = []
+    for mes in sorted(set(como_lista(meses))):
+        if mes in indice["rangos"]:
+            rangos.append(indice["rangos"][mes])
+        else:
+            logger.warning(f"El mes {mes} no está en el índice")
+
+    if not rangos:
+        return slice(0, 0)
+
+    contiguos = all(fin == inicio for (_, fin), (inicio, _) in zip(rangos, rangos[1:]))
+    if contiguos:
+        return slice(rangos[0][0], rangos[-1][1])
+
+    logger.debug(f"Meses no contiguos {meses}: se copian las filas")
+    return np.concatenate([np.arange(inicio, fin) for inicio, fin in rangos])
+
+def particion(indice: dict, meses) -> tuple[np.ndarray | sp.csr_matrix, np.ndarray]:
+    """
+    Obtiene features y etiquetas de los meses pedidos sin recorrer el DataFrame.
+    Si todas las columnas están en un mismo bloque (densa o CSR) y los meses son contiguos,
+    devuelve una vista sin copia. Si el índice combina columnas densas y CSR, devuelve una
+    única matriz CSR (bloque denso a la izquierda, igual que "columnas") que se arma una
+    sola vez por combinación de meses y se reutiliza en los trials siguientes.
+
+    Args:
+        indice: Índice construido con construir_indice_meses
+        meses: Mes o lista de meses
+
+    Returns:
+        tuple: (X, y)
+    """
+    filas = _filas(indice, meses)
+    densa, dispersa = indice["densa"], indice["dispersa"]
+
+    if dispersa is None:
+        return densa[filas], indice["y"][filas]
+
+    if densa is None:
+        bloque_disperso = _filas_csr(dispersa, filas) if isinstance(filas, slice) else dispersa[filas]
+        return bloque_disperso, indice["y"][filas]
+
+    # Índice mixto: una sola CSR para LightGBM, cacheada por combinación de meses
+    clave = tuple(sorted(set(como_lista(meses))))
+    with _lock_particiones:
+        if clave not in indice["particiones"]:
+            bloque_disperso = _filas_csr(dispersa, filas) if isinstance(filas, slice) else dispersa[filas]
+            indice["particiones"][clave] = sp.hstack([sp.csr_matrix(densa[filas]), bloque_disperso], format="csr")
+            logger.debug(f"Partición CSR armada para los meses {list(clave)}")
+        X = indice["particiones"][clave]
+
+    return X, indice["y"][filas]
+
+def clientes(indice: dict, meses) -> np.ndarray:
+    """
+    Obtiene los numero_de_cliente de los meses pedidos, alineados con particion
+    """
+    return indice["clientes"][_filas(indice, meses)]
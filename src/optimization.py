@@ -5,15 +5,43 @@ import numpy as np
 import logging
 import json
 import os
+import time
+import threading
 from datetime import datetime
 from .conf import *
-from .gain_function import calcular_ganancia, ganancia_lgb_binary
+from .gain_function import ganancia_lgb_binary, analizar_curva, ganancia_en_umbrales
+from .indice_meses import asegurar_indice, particion, como_lista
+from .perfiles import sugerir_parametros, combinar_con_perfil
+from .recursos import hilos_disponibles, etapa_paralela, ejecutar_con_hilos, memoria_rss_mb
+from .best_params import metrica_objetivo
 
-def objetivo_ganancia(trial,df) -> float:
+def resolver_ventana(ventana: dict = None) -> dict:
+    """
+    Completa una ventana de meses (MES_TRAIN, MES_VALIDACION, MES_TEST) con los valores de conf.yaml
+
+    Args:
+        ventana: Diccionario con alguna de las claves MES_TRAIN, MES_VALIDACION, MES_TEST
+
+    Returns:
+        dict: Ventana completa
+    """
+    return {
+        "MES_TRAIN": MES_TRAIN,
+        "MES_VALIDACION": MES_VALIDACION,
+        "MES_TEST": MES_TEST,
+        **(ventana or {})
+    }
+
+def objetivo_ganancia(trial, indice, perfil=None, archivo_base=None, deadline=None, ventana=None, modo_costo=None) -> float | tuple[float, float]:
     """
     Parameters:
         trial: Trial de Optuna
-        df: DataFrame con los datos
+        indice: Índice por mes construido con construir_indice_meses
+        perfil: Perfil de entrenamiento (si es None, usa el de conf.yaml)
+        archivo_base: Nombre base del archivo de iteraciones (si es None, usa STUDY_NAME)
+        deadline: Instante (time.monotonic) en que se corta el entrenamiento y se poda el trial
+        ventana: Meses de train/validación (si es None, usa los de conf.yaml)
+        modo_costo: ganancia | penalizado | multiobjetivo (si es None, usa objetivo_costo.MODO de conf.yaml)
 
     Description:
     Función objetivo que maximiza ganancia en mes de validación
@@ -21,82 +49,209 @@ def objetivo_ganancia(trial,df) -> float:
     Define parámetros para el modelo LightGBM
     Preparar dataset para entrenamiento y validación
     Entrenar modelo con función de ganancia personalizada
-    Predecir y calcular ganancia
+    Predecir y calcular ganancia en el corte óptimo de la curva de ganancia
+    Registrar telemetría del trial (tiempos, rounds, incremento de memoria)
     Guardar cada iteración en JSON
 
     Returns:
-        float: Ganancia total
+        float: Ganancia total (penalizada por segundo en modo penalizado)
+        tuple: (ganancia, segundos) en modo multiobjetivo
     """
-    # Hiperparámetros a optimizar 
+    if modo_costo is None:
+        modo_costo = OBJETIVO_COSTO.get("MODO", "ganancia")
+
+    # Hiperparámetros a optimizar (rangos de conf YAML + perfil de entrenamiento)
     params = {
         "objective": "binary",
-        "boosting_type": "gbdt",
         "metric": "None",
-        "num_leaves": trial.suggest_int("num_leaves", PARAMETROS_LGB['num_leaves'][0], PARAMETROS_LGB['num_leaves'][1]),
-        "learning_rate": trial.suggest_float("learning_rate", PARAMETROS_LGB['learning_rate'][0], PARAMETROS_LGB['learning_rate'][1]),
-        "feature_fraction": trial.suggest_float("feature_fraction", PARAMETROS_LGB['feature_fraction'][0], PARAMETROS_LGB['feature_fraction'][1]),
-        "bagging_fraction": trial.suggest_float("bagging_fraction", PARAMETROS_LGB['bagging_fraction'][0], PARAMETROS_LGB['bagging_fraction'][1]),
-        "min_data_in_leaf": trial.suggest_int("min_data_in_leaf", PARAMETROS_LGB['min_data_in_leaf'][0], PARAMETROS_LGB['min_data_in_leaf'][1]),
-        "max_depth": trial.suggest_int("max_depth", PARAMETROS_LGB['max_depth'][0], PARAMETROS_LGB['max_depth'][1]),
-        "lambda_l1": trial.suggest_float("lambda_l1", PARAMETROS_LGB['lambda_l1'][0], PARAMETROS_LGB['lambda_l1'][1]),
-        "lambda_l2": trial.suggest_float("lambda_l2", PARAMETROS_LGB['lambda_l2'][0], PARAMETROS_LGB['lambda_l2'][1]),
+        **sugerir_parametros(trial, perfil),
         "min_gain_to_split": 0.0,
         "verbose": -1,
         "silent": True,
-        "bin": 31,
         "random_state": SEMILLA[0]
     }
 
-    # Preparar datos usando conf YAML
-    if isinstance(MES_TRAIN, list):
-        df_train = df[df["foto_mes"].isin(MES_TRAIN)]
+    # Preparar datos usando el índice por mes (vistas, sin copiar)
+    ventana = resolver_ventana(ventana)
+    X_train, y_train = particion(indice, ventana["MES_TRAIN"])
+    X_val, y_val = particion(indice, ventana["MES_VALIDACION"])
+
+    # Muestras de RSS durante la construcción del Dataset y el entrenamiento
+    memoria = [memoria_rss_mb()]
+
+    inicio_dataset = time.perf_counter()
+    train_data = lgb.Dataset(X_train, label=y_train, feature_name=indice["columnas"], params=params).construct()
+    val_data = lgb.Dataset(X_val, label=y_val, reference=train_data).construct()
+    segundos_dataset = time.perf_counter() - inicio_dataset
+    memoria.append(memoria_rss_mb())
+
+    # callback_telemetria va antes que callback_deadline: registra la iteración que se corta
+    progreso = {"rounds": 0}
+    callbacks = [lgb.early_stopping(stopping_rounds=50), lgb.log_evaluation(0), callback_telemetria(memoria, progreso)]
+    if deadline is not None:
+        callbacks.append(callback_deadline(deadline))
+
+    inicio_entrenamiento = time.perf_counter()
+    try:
+        model = lgb.train(
+            params, 
+            train_data, 
+            valid_sets=[val_data],
+            feval = ganancia_lgb_binary, # Función de ganancia personalizada
+            callbacks=callbacks
+        )
+    except optuna.TrialPruned:
+        # Los trials cortados por deadline son justamente las configuraciones lentas: se registran igual
+        memoria.append(memoria_rss_mb())
+        telemetria = {**_telemetria(segundos_dataset, time.perf_counter() - inicio_entrenamiento, progreso["rounds"], memoria), "envios": None}
+        for clave, valor in telemetria.items():
+            trial.set_user_attr(clave, valor)
+        guardar_iteracion(trial, None, archivo_base=archivo_base, perfil=perfil, ventana=ventana,
+                          telemetria=telemetria, metrica=metrica_objetivo(modo_costo), estado="PRUNED")
+        logger.info(
+            f"Trial {trial.number}: podado por deadline - "
+            f"{telemetria['segundos_totales']:.1f} s, {telemetria['rounds']} rounds"
+        )
+        raise
+    segundos_entrenamiento = time.perf_counter() - inicio_entrenamiento
+    memoria.append(memoria_rss_mb())
+
+    # Predecir y calcular ganancia en el corte óptimo (curva suavizada)
+    y_pred_proba = model.predict(X_val, num_threads=hilos_disponibles())
+    curva = analizar_curva(y_val, y_pred_proba)
+
+    ganancia_total = float(curva["ganancia_suavizada"])
+    envios = int(curva["envios_suavizado"])
+
+    rounds = model.best_iteration if model.best_iteration > 0 else model.current_iteration()
+    telemetria = {**_telemetria(segundos_dataset, segundos_entrenamiento, rounds, memoria), "envios": envios}
+    for clave, valor in telemetria.items():
+        trial.set_user_attr(clave, valor)
+
+    if modo_costo == "penalizado":
+        valor = ganancia_total - OBJETIVO_COSTO.get("PENALIZACION_POR_SEGUNDO", 0) * telemetria["segundos_totales"]
     else:
-        df_train = df[df["foto_mes"] == MES_TRAIN]
-    
-    df_val = df[df["foto_mes"].isin(MES_VALIDACION)]
+        valor = ganancia_total
 
-    X_train = df_train.drop(columns=["clase_ternaria"])
-    y_train = df_train["clase_ternaria"].values
+    # Guardar cada iteración en JSON 
+    guardar_iteracion(trial, valor, archivo_base=archivo_base, perfil=perfil, ventana=ventana,
+                      ganancia_bruta=ganancia_total, telemetria=telemetria, metrica=metrica_objetivo(modo_costo))
 
-    X_val = df_val.drop(columns=["clase_ternaria"])
-    y_val = df_val["clase_ternaria"].values
+    logger.info(
+        f"Trial {trial.number}: Ganancia = {ganancia_total} con {envios} envíos - "
+        f"{telemetria['segundos_totales']:.1f} s, {telemetria['rounds']} rounds"
+    )
 
-    train_data = lgb.Dataset(X_train, label=y_train)
-    val_data = lgb.Dataset(X_val, label=y_val, reference=train_data)
+    if modo_costo == "multiobjetivo":
+        return ganancia_total, telemetria["segundos_totales"]
+    return valor
 
-    model = lgb.train(
-        params, 
-        train_data, 
-        valid_sets=[val_data],
-        feval = ganancia_lgb_binary, # Función de ganancia personalizada
-        callbacks=[lgb.early_stopping(stopping_rounds=50), lgb.log_evaluation(0)]
-    )
 
-    # Predecir y calcular ganancia
-    y_pred_proba = model.predict(X_val)
-    y_pred_binary = (y_pred_proba >= 0.025).astype(int)
+def callback_deadline(deadline: float):
+    """
+    Callback de LightGBM que corta el entrenamiento al pasar el deadline.
+    Lanza optuna.TrialPruned, que atraviesa lgb.train y Optuna registra el trial como podado.
 
-    ganancia_total = calcular_ganancia(y_val, y_pred_binary)
+    Args:
+        deadline: Instante (time.monotonic) límite del trial
 
-    # Guardar cada iteración en JSON 
-    guardar_iteracion(trial, ganancia_total)
+    Returns:
+        callable: Callback para lgb.train
+    """
+    def _callback(env):
+        if time.monotonic() > deadline:
+            raise optuna.TrialPruned(f"Deadline excedido en la iteración {env.iteration}")
+    return _callback
+
+def callback_telemetria(muestras: list, progreso: dict):
+    """
+    Callback de LightGBM que agrega una muestra del RSS del proceso y registra
+    la cantidad de rounds alcanzados en cada iteración
 
-    logger.info(f"Trial {trial.number}: Ganancia = {ganancia_total}")
+    Args:
+        muestras: Lista donde se agregan las muestras en MB
+        progreso: Diccionario donde se actualiza "rounds"
 
-    return ganancia_total
+    Returns:
+        callable: Callback para lgb.train
+    """
+    def _callback(env):
+        muestras.append(memoria_rss_mb())
+        progreso["rounds"] = env.iteration + 1
+    return _callback
 
+def _telemetria(segundos_dataset: float, segundos_entrenamiento: float, rounds: int, memoria: list) -> dict:
+    """
+    Telemetría de un trial. memoria_incremento_mb es el máximo RSS muestreado (Dataset y cada
+    iteración) menos el RSS al inicio del trial: es RSS del proceso, así que con trials o
+    experimentos en paralelo incluye la memoria que asignan los demás en ese lapso
+    """
+    return {
+        "segundos_dataset": segundos_dataset,
+        "segundos_entrenamiento": segundos_entrenamiento,
+        "segundos_totales": segundos_dataset + segundos_entrenamiento,
+        "rounds": rounds,
+        "memoria_incremento_mb": max(memoria) - memoria[0] if None not in memoria else None
+    }
 
-def guardar_iteracion(trial, ganancia, archivo_base=None):
+def callback_progreso(n_trials: int, inicio: float, tiempo_total: float = None):
+    """
+    Callback de Optuna que reporta throughput (trials/hora) y ETA a partir de los trials
+    terminados sobre el tiempo de reloj transcurrido, así con trials en paralelo (n_jobs)
+    el ritmo ya incluye la concurrencia
+
+    Args:
+        n_trials: Cantidad de trials pedidos
+        inicio: Instante (time.monotonic) de inicio de la optimización
+        tiempo_total: Presupuesto global en segundos (None = sin límite)
+
+    Returns:
+        callable: Callback para study.optimize
+    """
+    def _callback(study, trial):
+        terminados = len(duracion_trials(study))
+        transcurrido = time.monotonic() - inicio
+        if not terminados or transcurrido <= 0:
+            return
+
+        trials_por_segundo = terminados / transcurrido
+        eta = max(n_trials - terminados, 0) / trials_por_segundo
+        if tiempo_total is not None:
+            eta = min(eta, max(tiempo_total - transcurrido, 0))
+
+        logger.info(
+            f"Progreso: {terminados}/{n_trials} trials ({trial.state.name}) - "
+            f"{3600 * trials_por_segundo:,.1f} trials/hora - "
+            f"transcurrido {transcurrido:,.0f} s - ETA {eta:,.0f} s"
+        )
+    return _callback
+
+# Los trials en paralelo escriben el mismo archivo de iteraciones
+_lock_iteraciones = threading.Lock()
+
+def guardar_iteracion(trial, ganancia, archivo_base=None, perfil=None, ventana=None, ganancia_bruta=None, telemetria=None, metrica=None, estado="COMPLETE"):
     """
     Guarda cada iteración de la optimización en un único archivo JSON
 
     Args: 
     trial: Trial de Optuna
-    ganancia: Valor de ganancia obtenido
+    ganancia: Valor de ganancia obtenido (el valor que optimiza el estudio)
     archivo_base: Nombre base del archivo (si es None, usa el de config.yaml)
+    perfil: Perfil de entrenamiento usado (si es None, usa el de config.yaml)
+    ventana: Meses de train/validación usados (si es None, usa los de config.yaml)
+    ganancia_bruta: Ganancia sin penalizar por tiempo (si es None, igual a ganancia)
+    telemetria: Tiempos, rounds, incremento de memoria y envíos del trial
+    estado: "COMPLETE" o "PRUNED" (podado por deadline, con ganancia None y telemetría parcial)
+    metrica: Métrica de ganancia (si es None, la del objetivo de config.yaml). Al cargar los mejores
+             hiperparámetros sólo se comparan iteraciones de la misma métrica
     """
     if archivo_base is None: 
         archivo_base = STUDY_NAME
+    if perfil is None:
+        perfil = PERFIL
+    if metrica is None:
+        metrica = metrica_objetivo()
+    ventana = resolver_ventana(ventana)
 
     # Nombre del archivo único para todas las iteraciones
     archivo = f"resultados_{archivo_base}_iteraciones.json"
@@ -105,16 +260,31 @@ def guardar_iteracion(trial, ganancia, archivo_base=None):
     iteracion_data = {
         "trial_number": trial.number,
         "params": trial.params,
-        "value": float(ganancia),
+        "value": None if ganancia is None else float(ganancia),
+        "metrica": metrica,
+        "ganancia_bruta": None if ganancia is None else float(ganancia if ganancia_bruta is None else ganancia_bruta),
+        "telemetria": telemetria or {},
         "datetime": datetime.now().isoformat(),
-        "state": 'COMPLETE', # si llega aquí es porque terminó exitosamente
+        "state": estado,
         "configuración": {
             "semilla": SEMILLA,
-            "mes_train": MES_TRAIN,
-            "mes_validación": MES_VALIDACION
+            "mes_train": ventana["MES_TRAIN"],
+            "mes_validación": ventana["MES_VALIDACION"],
+            "perfil": perfil
         }
     }
     
+    with _lock_iteraciones:
+        _agregar_iteracion(archivo, iteracion_data)
+
+    logger.info(f"Iteración {trial.number} guardada en {archivo}")
+    if ganancia is not None:
+        logger.info(f"Ganancia: {ganancia:,}" + "---" + f"Parámetros:{trial.params}")
+
+def _agregar_iteracion(archivo, iteracion_data):
+    """
+    Agrega una iteración al archivo JSON de iteraciones
+    """
     # Cargar datos existentes si el archivo ya existe 
     if os.path.exists(archivo):
         with open(archivo, "r") as f:
@@ -134,89 +304,228 @@ def guardar_iteracion(trial, ganancia, archivo_base=None):
     # Guardar el archivo
     with open(archivo, "w") as f:
         json.dump(datos_existentes, f, indent=2)
-
-    logger.info(f"Iteración {trial.number} guardada en {archivo}")
-    logger.info(f"Ganancia: {ganancia:,}" + "---" + f"Parámetros:{trial.params}")
     
 
 from src.conf import STUDY_NAME
 
-def optimizar(df: pd.DataFrame, n_trials: int, study_name: str = None) -> optuna.Study:
+def optimizar(df: pd.DataFrame | dict, n_trials: int = None, study_name: str = None, perfil: str = None,
+              tiempo_total: float = None, tiempo_trial: float = None, ventana: dict = None,
+              modo_costo: str = None, trials_en_paralelo: int = None,
+              trials_encolados: list[dict] = None) -> optuna.Study:
     """
     Args:
-        df: DataFrame con los datos
-        n_trial: Número de trials para la optimización
-        study_name: Nombre del study
+        df: DataFrame con los datos o índice por mes ya construido
+        n_trial: Número de trials para la optimización (si es None, usa parametros_lgb.n_trials)
+        study_name: Nombre del study (si es None, usa STUDY_NAME)
+        perfil: Perfil de entrenamiento (si es None, usa el de conf.yaml)
+        tiempo_total: Presupuesto global en segundos (si es None, usa presupuesto_tiempo de conf.yaml)
+        tiempo_trial: Deadline por trial en segundos (si es None, usa presupuesto_tiempo de conf.yaml)
+        ventana: Meses de train/validación (si es None, usa los de conf.yaml)
+        modo_costo: ganancia | penalizado | multiobjetivo (si es None, usa objetivo_costo.MODO de conf.yaml)
+        trials_en_paralelo: Trials en simultáneo, cada uno con su parte del presupuesto de CPU
+                            (si es None, usa recursos.TRIALS_EN_PARALELO de conf.yaml)
+        trials_encolados: Hiperparámetros fijos para los primeros trials (study.enqueue_trial),
+                          por ejemplo para comparar perfiles con los mismos parámetros
 
     Descripción:
         Ejecuta optimización bayesiana de hiperparámetros usando configuración YAML
         Guarda cada iteración en un archivo JSON separado
         Pasos:
         1. Crear estudio de Optuna
-        2. Ejecutar optimización
-        3. Retornar estudio
+        2. Ejecutar optimización hasta n_trials o hasta agotar el presupuesto de tiempo.
+           Cada trial se corta en min(deadline del trial, fin del presupuesto) y se registra como podado
+        3. En modo multiobjetivo, reportar el frente de Pareto ganancia/tiempo
+        4. Retornar estudio
 
     Returns:
         optuna.Study: Estudio de Optuna con resultados
     """
 
-    study_name = STUDY_NAME
-
-    logger.info(f"Iniciando optimización con {n_trials} trials")
-    logger.info(f"Configuración: TRIAN = {MES_TRAIN}, VALID = {MES_VALIDACION}, SEMILLA = {SEMILLA}")
-
-    study = optuna.create_study(direction="maximize", study_name=study_name)
+    if study_name is None:
+        study_name = STUDY_NAME
+    if perfil is None:
+        perfil = PERFIL
+    if n_trials is None:
+        n_trials = PARAMETROS_LGB.get("n_trials", 100)
+    if tiempo_total is None:
+        tiempo_total = PRESUPUESTO_TIEMPO.get("TIEMPO_TOTAL_SEGUNDOS")
+    if tiempo_trial is None:
+        tiempo_trial = PRESUPUESTO_TIEMPO.get("TIEMPO_TRIAL_SEGUNDOS")
+    if modo_costo is None:
+        modo_costo = OBJETIVO_COSTO.get("MODO", "ganancia")
+    if trials_en_paralelo is None:
+        trials_en_paralelo = RECURSOS.get("TRIALS_EN_PARALELO", 1)
+
+    logger.info(f"Iniciando optimización con {n_trials} trials y perfil {perfil}")
+    logger.info(f"Presupuesto de tiempo: total = {tiempo_total} s, por trial = {tiempo_trial} s")
+    logger.info(f"Objetivo: {modo_costo}")
+    ventana = resolver_ventana(ventana)
+    logger.info(f"Configuración: TRIAN = {ventana['MES_TRAIN']}, VALID = {ventana['MES_VALIDACION']}, SEMILLA = {SEMILLA}")
+
+    segundos_maximos = OBJETIVO_COSTO.get("SEGUNDOS_MAXIMOS_MODELO")
+    if modo_costo == "multiobjetivo" and segundos_maximos is None:
+        # Sin límite de tiempo, el frente de Pareto no alcanza para elegir un modelo
+        raise ValueError("En modo multiobjetivo hay que fijar objetivo_costo.SEGUNDOS_MAXIMOS_MODELO")
+
+    if modo_costo == "multiobjetivo":
+        # Maximizar ganancia y minimizar segundos por trial
+        study = optuna.create_study(directions=["maximize", "minimize"], study_name=study_name)
+    else:
+        study = optuna.create_study(direction="maximize", study_name=study_name)
+
+    for params in trials_encolados or []:
+        study.enqueue_trial(params, skip_if_exists=True)
+
+    # El índice se construye una sola vez y lo comparten todos los trials
+    indice = asegurar_indice(df)
+
+    inicio = time.monotonic()
+    fin_presupuesto = inicio + tiempo_total if tiempo_total is not None else None
+
+    def deadline_trial():
+        # El trial termina en su deadline o al agotarse el presupuesto global, lo que ocurra antes
+        limites = []
+        if tiempo_trial is not None:
+            limites.append(time.monotonic() + tiempo_trial)
+        if fin_presupuesto is not None:
+            limites.append(fin_presupuesto)
+        return min(limites) if limites else None
+
+    # Cada trial en paralelo usa su parte del presupuesto de CPU
+    with etapa_paralela(trials_en_paralelo) as hilos_trial:
+        # Función objetivo parcial con datos 
+        objetive_with_data = lambda trial : ejecutar_con_hilos(
+            hilos_trial, objetivo_ganancia,
+            trial, indice, perfil=perfil, archivo_base=study_name, deadline=deadline_trial(), ventana=ventana,
+            modo_costo=modo_costo
+        )
+
+        # Ejecutar optimización (timeout evita lanzar trials nuevos una vez agotado el presupuesto)
+        study.optimize(
+            objetive_with_data,
+            n_trials=n_trials,
+            timeout=tiempo_total,
+            n_jobs=trials_en_paralelo,
+            callbacks=[callback_progreso(n_trials, inicio, tiempo_total)],
+            show_progress_bar=True
+        )
+
+    completos = study.get_trials(deepcopy=False, states=[optuna.trial.TrialState.COMPLETE])
+    podados = study.get_trials(deepcopy=False, states=[optuna.trial.TrialState.PRUNED])
+    logger.info(f"Optimización terminada en {time.monotonic() - inicio:,.0f} s: {len(completos)} trials completos, {len(podados)} podados por deadline")
 
-    # Función objetivo parcial con datos 
-    objetive_with_data = lambda trial : objetivo_ganancia(trial, df)
+    # Resultados
+    if not completos:
+        logger.warning("Ningún trial terminó dentro del presupuesto de tiempo")
+        return study
 
-    # Ejecutar optimización
-    study.optimize(
-        objetive_with_data,
-        n_trials=n_trials,
-        show_progress_bar=True
-    )
+    if modo_costo == "multiobjetivo":
+        reportar_frente_pareto(study)
+        elegir_del_frente(study, segundos_maximos)
+        return study
 
-    # Resultados
     logger.info(f"Mejor ganancia: {study.best_value:,.0f}")
     logger.info(f"Mejores hiperparámetros: {study.best_params}")
     
     return study
     
-def evaluar_en_test(df: pd.DataFrame, mejores_params: dict) -> float:
+def reportar_frente_pareto(study: optuna.Study) -> list[optuna.trial.FrozenTrial]:
+    """
+    Reporta los trials del frente de Pareto ganancia/tiempo de un estudio multiobjetivo
+
+    Args:
+        study: Estudio de Optuna con direcciones [maximize, minimize]
+
+    Returns:
+        list: Trials del frente de Pareto, ordenados por tiempo
+    """
+    frente = sorted(study.best_trials, key=lambda trial: trial.values[1])
+
+    logger.info(f"Frente de Pareto ganancia/tiempo: {len(frente)} trials")
+    for trial in frente:
+        logger.info(
+            f"Trial {trial.number}: ganancia {trial.values[0]:,.0f} en {trial.values[1]:.1f} s "
+            f"({trial.user_attrs.get('rounds')} rounds) - {trial.params}"
+        )
+
+    return frente
+
+def elegir_del_frente(study: optuna.Study, segundos_maximos: float) -> optuna.trial.FrozenTrial | None:
+    """
+    Elige el trial de mayor ganancia del frente de Pareto que entrena dentro del límite de tiempo
+
+    Args:
+        study: Estudio de Optuna con direcciones [maximize, minimize]
+        segundos_maximos: Segundos máximos de dataset + entrenamiento (SEGUNDOS_MAXIMOS_MODELO)
+
+    Returns:
+        optuna.trial.FrozenTrial: Trial elegido (None si ninguno del frente entra en el límite)
+    """
+    dentro = [trial for trial in study.best_trials if trial.values[1] <= segundos_maximos]
+    if not dentro:
+        logger.warning(f"Ningún trial del frente de Pareto entrena en menos de {segundos_maximos} s")
+        return None
+
+    elegido = max(dentro, key=lambda trial: trial.values[0])
+    logger.info(
+        f"Mejor trial de esta corrida en el frente dentro de {segundos_maximos} s: {elegido.number} - "
+        f"ganancia {elegido.values[0]:,.0f} en {elegido.values[1]:.1f} s"
+    )
+    return elegido
+
+def duracion_trials(study: optuna.Study) -> list[float]:
+    """
+    Duración en segundos de cada trial terminado del estudio
+
+    Args:
+        study: Estudio de Optuna
+
+    Returns:
+        list[float]: Segundos por trial
+    """
+    return [
+        (trial.datetime_complete - trial.datetime_start).total_seconds()
+        for trial in study.trials
+        if trial.datetime_start is not None and trial.datetime_complete is not None
+    ]
+
+def evaluar_en_test(df: pd.DataFrame | dict, mejores_params: dict, perfil: str = None, ventana: dict = None) -> tuple[float, int]:
     """
     Evalúa el modelo con los mejores hiperparámetros en el conjunto de datos test. 
     Sólo calcula la ganancia, sin usar sklearn. 
+    El corte se elige sobre la curva de ganancia suavizada en lugar de un umbral fijo.
 
     Args: 
-        df: DataFrame con los datos
+        df: DataFrame con los datos o índice por mes ya construido
         mejores_params: Diccionario con los mejores hiperparámetros encontrados por Optuna
+        perfil: Perfil de entrenamiento (si es None, usa el de conf.yaml)
+        ventana: Meses de train/validación/test (si es None, usa los de conf.yaml)
     
     Returns:
-        float: Ganancia total    
+        tuple: (ganancia total, cantidad de envíos en el corte óptimo)
     """
 
     logger.info("===EVALUACIÓN EN EL CONJUNTO DE TEST===")
-    logger.info(f"Período de test: {MES_TEST}")
+    ventana = resolver_ventana(ventana)
+    logger.info(f"Período de test: {ventana['MES_TEST']}")
+
+    indice = asegurar_indice(df)
 
     # Preparar datos de entrenamiento (TRAIN + VALIDACION)
-    if isinstance(MES_TRAIN,list):
-        periodos_entrenamiento = MES_TRAIN + [MES_VALIDACION]
-    else:
-        periodos_entrenamiento = [MES_TRAIN, MES_VALIDACION]
+    periodos_entrenamiento = como_lista(ventana["MES_TRAIN"]) + como_lista(ventana["MES_VALIDACION"])
 
-    # Generar df de train y de test
-    df_train = df[df["foto_mes"].isin(periodos_entrenamiento)]
-    df_test = df[df["foto_mes"].isin(MES_TEST)]
-    
-    #Entrenar modelo con mejores hiperparámetros
-    params = mejores_params
-    params["random_state"] = SEMILLA[0]
+    #Entrenar modelo con mejores hiperparámetros y el mismo perfil que en la optimización
+    params = {
+        "objective": "binary",
+        "metric": "None",
+        "verbose": -1,
+        **combinar_con_perfil(mejores_params, perfil),
+        "random_state": SEMILLA[0]
+    }
     
-    X_train = df_train.drop(columns=["clase_ternaria"])
-    y_train = df_train["clase_ternaria"].values
+    X_train, y_train = particion(indice, periodos_entrenamiento)
     
-    train_data = lgb.Dataset(X_train, label=y_train)
+    train_data = lgb.Dataset(X_train, label=y_train, feature_name=indice["columnas"])
     
     model = lgb.train(
         params,
@@ -226,16 +535,15 @@ def evaluar_en_test(df: pd.DataFrame, mejores_params: dict) -> float:
     )
 
     # Predecir y calcular ganancia
-    X_test = df_test.drop(columns=["clase_ternaria"])
-    y_pred_proba = model.predict(X_test)
-    y_pred_binary = (y_pred_proba >= 0.025).astype(int)
-    
-    ganancia_total = calcular_ganancia(df_test["clase_ternaria"], y_pred_binary)
+    X_test, y_test = particion(indice, ventana["MES_TEST"])
+    y_pred_proba = model.predict(X_test, num_threads=hilos_disponibles())
+    curva = analizar_curva(y_test, y_pred_proba)
     
-    logger.info(f"Ganancia total: {ganancia_total:,.0f}")
+    ganancia_total = float(curva["ganancia_suavizada"])
+    envios = int(curva["envios_suavizado"])
     
-    return ganancia_total
+    logger.info(f"Ganancia total: {ganancia_total:,.0f} con {envios} envíos")
+    logger.info(f"Ganancia máxima sin suavizar: {curva['ganancia_maxima']:,.0f} con {curva['envios_optimos']} envíos")
+    logger.info(f"Ganancia con umbral fijo 0.025: {ganancia_en_umbrales(y_test, y_pred_proba, [0.025])[0]:,.0f}")
     
-
-
-    
\ No newline at end of file
+    return ganancia_total, envios
@@ -0,0 +1,87 @@
+import logging
+from .conf import PARAMETROS_LGB, PERFILES_LGB, PERFIL
+from .recursos import hilos_disponibles
+
+logger = logging.getLogger(__name__)
+
+# Parámetros que GOSS no admite (LightGBM: "Cannot use bagging in GOSS")
+PARAMETROS_BAGGING = ("bagging_fraction", "bagging_freq")
+
+def parametros_perfil(perfil: str = None) -> dict:
+    """
+    Parámetros fijos de LightGBM para un perfil de entrenamiento de conf.yaml
+
+    Args:
+        perfil: Nombre del perfil (si es None, usa PERFIL de conf.yaml)
+
+    Returns:
+        dict: Parámetros del perfil, incluyendo num_threads según el presupuesto de CPU de la etapa
+    """
+    if perfil is None:
+        perfil = PERFIL
+
+    if perfil not in PERFILES_LGB:
+        raise ValueError(f"Perfil de entrenamiento desconocido: {perfil}. Disponibles: {list(PERFILES_LGB)}")
+
+    return {**PERFILES_LGB[perfil], "num_threads": hilos_disponibles()}
+
+def usa_goss(params: dict) -> bool:
+    """
+    Indica si los parámetros usan muestreo GOSS
+    """
+    return params.get("data_sample_strategy") == "goss" or params.get("boosting_type") == "goss"
+
+def sugerir_parametros(trial, perfil: str = None) -> dict:
+    """
+    Espacio de búsqueda de Optuna según los rangos de parametros_lgb y el perfil elegido.
+    Los parámetros que el perfil fija (por ejemplo max_bin) no se muestrean.
+
+    Args:
+        trial: Trial de Optuna
+        perfil: Nombre del perfil (si es None, usa PERFIL de conf.yaml)
+
+    Returns:
+        dict: Parámetros muestreados combinados con los del perfil
+    """
+    params_perfil = parametros_perfil(perfil)
+
+    params = {
+        "num_leaves": trial.suggest_int("num_leaves", PARAMETROS_LGB['num_leaves'][0], PARAMETROS_LGB['num_leaves'][1]),
+        "learning_rate": trial.suggest_float("learning_rate", PARAMETROS_LGB['learning_rate'][0], PARAMETROS_LGB['learning_rate'][1]),
+        "feature_fraction": trial.suggest_float("feature_fraction", PARAMETROS_LGB['feature_fraction'][0], PARAMETROS_LGB['feature_fraction'][1]),
+        "min_data_in_leaf": trial.suggest_int("min_data_in_leaf", PARAMETROS_LGB['min_data_in_leaf'][0], PARAMETROS_LGB['min_data_in_leaf'][1]),
+        "max_depth": trial.suggest_int("max_depth", PARAMETROS_LGB['max_depth'][0], PARAMETROS_LGB['max_depth'][1]),
+        "lambda_l1": trial.suggest_float("lambda_l1", PARAMETROS_LGB['lambda_l1'][0], PARAMETROS_LGB['lambda_l1'][1]),
+        "lambda_l2": trial.suggest_float("lambda_l2", PARAMETROS_LGB['lambda_l2'][0], PARAMETROS_LGB['lambda_l2'][1]),
+    }
+
+    if not usa_goss(params_perfil):
+        params["bagging_fraction"] = trial.suggest_float("bagging_fraction", PARAMETROS_LGB['bagging_fraction'][0], PARAMETROS_LGB['bagging_fraction'][1])
+
+    if "max_bin" not in params_perfil and "bin" in PARAMETROS_LGB:
+        params["max_bin"] = trial.suggest_int("max_bin", PARAMETROS_LGB['bin'][0], PARAMETROS_LGB['bin'][1])
+
+    return {**params, **params_perfil}
+
+def combinar_con_perfil(mejores_params: dict, perfil: str = None) -> dict:
+    """
+    Aplica el perfil de entrenamiento sobre los mejores hiperparámetros (para test y entrenamiento final).
+    Si el perfil usa GOSS se descartan los parámetros de bagging que vengan de la optimización.
+
+    Args:
+        mejores_params: Diccionario con los mejores hiperparámetros encontrados por Optuna
+        perfil: Nombre del perfil (si es None, usa PERFIL de conf.yaml)
+
+    Returns:
+        dict: Parámetros combinados
+    """
+    params_perfil = parametros_perfil(perfil)
+    params = {**params_perfil, **mejores_params}
+
+    if usa_goss(params_perfil):
+        descartados = [p for p in PARAMETROS_BAGGING if p in params]
+        if descartados:
+            logger.warning(f"El perfil usa GOSS: se descartan {descartados}")
+        params = {k: v for k, v in params.items() if k not in PARAMETROS_BAGGING}
+
+    return params
@@ -0,0 +1,123 @@
+import os
+import threading
+import logging
+from contextlib import contextmanager
+from threadpoolctl import threadpool_limits
+from .conf import RECURSOS
+
+logger = logging.getLogger(__name__)
+
+# Hilos asignados a la etapa que corre en cada thread (lo leen LightGBM y DuckDB)
+_estado = threading.local()
+
+def hilos_totales() -> int:
+    """
+    Presupuesto total de CPU: recursos.CPU_MAXIMO de conf.yaml, acotado a los cores disponibles
+    (0 o null = todos los cores disponibles)
+    """
+    if hasattr(os, "sched_getaffinity"):
+        disponibles = len(os.sched_getaffinity(0))
+    else:
+        disponibles = os.cpu_count() or 1
+
+    cpu_maximo = RECURSOS.get("CPU_MAXIMO") or 0
+    return min(cpu_maximo, disponibles) if cpu_maximo > 0 else disponibles
+
+def hilos_disponibles() -> int:
+    """
+    Hilos que puede usar la etapa actual: los asignados con presupuesto_hilos o, fuera de una
+    etapa paralela, el presupuesto total
+    """
+    return getattr(_estado, "hilos", None) or hilos_totales()
+
+def repartir_hilos(n_tareas: int) -> int:
+    """
+    Hilos por tarea al correr n_tareas en simultáneo dentro del presupuesto de la etapa actual
+
+    Args:
+        n_tareas: Cantidad de tareas concurrentes
+
+    Returns:
+        int: Hilos por tarea (al menos 1)
+    """
+    return max(1, hilos_disponibles() // max(1, n_tareas))
+
+@contextmanager
+def presupuesto_hilos(hilos: int):
+    """
+    Asigna hilos a la etapa que corre en el thread actual. Se usa dentro de cada worker
+    (threads de un barrido, trials en paralelo de Optuna)
+
+    Args:
+        hilos: Hilos asignados a la etapa
+    """
+    anterior = getattr(_estado, "hilos", None)
+    _estado.hilos = hilos
+    try:
+        yield hilos
+    finally:
+        _estado.hilos = anterior
+
+@contextmanager
+def etapa_paralela(n_tareas: int, tareas_anidadas: int = 1):
+    """
+    Reparte el presupuesto de la etapa actual entre n_tareas concurrentes.
+    El límite de BLAS (threadpoolctl) es del proceso: lo fija sólo la etapa paralela más
+    externa, desde el thread principal, repartido entre todas las tareas que corren a la vez
+    (n_tareas por las tareas_anidadas de cada una). Las etapas anidadas (por ejemplo los trials
+    en paralelo dentro de cada experimento de un barrido) sólo reparten hilos de LightGBM y
+    DuckDB, para no pisar el límite de las demás tareas ni restaurar un valor equivocado.
+
+    Args:
+        n_tareas: Cantidad de tareas concurrentes
+        tareas_anidadas: Tareas concurrentes que lanza cada una (para el límite de BLAS)
+
+    Returns:
+        int: Hilos por tarea, para pasarle a presupuesto_hilos dentro de cada worker
+    """
+    hilos = repartir_hilos(n_tareas)
+    tareas_totales = n_tareas * max(1, tareas_anidadas)
+    if tareas_totales <= 1:
+        yield hilos
+        return
+
+    if n_tareas > 1:
+        logger.info(f"Etapa paralela: {n_tareas} tareas con {hilos} hilos cada una")
+    if threading.current_thread() is not threading.main_thread():
+        yield hilos
+        return
+
+    with threadpool_limits(limits=repartir_hilos(tareas_totales)):
+        yield hilos
+
+def ejecutar_con_hilos(hilos: int, funcion, *args, **kwargs):
+    """
+    Corre funcion dentro de presupuesto_hilos (para pasar a executor.submit)
+    """
+    with presupuesto_hilos(hilos):
+        return funcion(*args, **kwargs)
+
+def memoria_rss_mb() -> float | None:
+    """
+    Memoria residente (RSS) actual del proceso en MB, leída de /proc/self/statm.
+    A diferencia de ru_maxrss, baja cuando se libera memoria, así que sirve para medir
+    el incremento durante una etapa. Devuelve None si el sistema no expone /proc.
+    """
+    try:
+        with open("/proc/self/statm") as f:
+            paginas_residentes = int(f.read().split()[1])
+    except (OSError, IndexError, ValueError):
+        return None
+    return paginas_residentes * os.sysconf("SC_PAGE_SIZE") / 1024 ** 2
+
+def aplicar_presupuesto_cpu() -> int:
+    """
+    Aplica el presupuesto total de CPU a BLAS para todo el proceso (llamar al inicio del script)
+
+    Returns:
+        int: Hilos del presupuesto total
+    """
+    hilos = hilos_totales()
+    threadpool_limits(limits=hilos)
+    logger.info(f"Presupuesto de CPU: {hilos} hilos")
+    return hilos